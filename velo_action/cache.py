@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional
+
+from loguru import logger
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with a size bound and expiring entries
+
+    Holds at most `maxsize` entries and evicts the least recently used one
+    when full. Entries older than `ttl` seconds are treated as missing. A `ttl`
+    of None keeps entries until they are evicted or invalidated.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value, or caches and returns the result of `factory`
+
+        The factory is called without holding the lock, so concurrent misses
+        for the same key may call it more than once.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        """Remove `key`, or every entry if no key is given"""
+        with self._lock:
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class DiskCache:
+    """
+    JSON values stored as files in a directory, expiring after `ttl` seconds
+
+    Keys are scoped by `namespace`, e.g. a server url, so several servers can
+    share one directory. The directory can be persisted between workflow runs
+    with actions/cache. If `maxsize` is given, the least recently used files
+    are removed once the directory holds more entries.
+    """
+
+    def __init__(
+        self,
+        directory,
+        namespace: str,
+        ttl: Optional[float],
+        maxsize: Optional[int] = None,
+    ):
+        self.directory = Path(directory).expanduser()
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None if it is missing or expired"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            logger.debug(f"Ignoring unreadable cache entry '{path}': {err}")
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("stored_at", 0) > self.ttl:
+            return None
+        if self.maxsize:
+            # The modification time tracks when an entry was last used
+            path.touch(exist_ok=True)
+        return entry.get("value")
+
+    def set(self, key: str, value: Any) -> None:
+        entry = {"stored_at": time.time(), "key": key, "value": value}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see
+            # a partially written entry
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, delete=False, encoding="utf-8"
+            ) as file:
+                json.dump(entry, file)
+            os.replace(file.name, self._path(key))
+        except OSError as err:
+            logger.debug(f"Could not write cache entry '{key}': {err}")
+            return
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        if not self.maxsize:
+            return
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.maxsize]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(f"{self.namespace}\n{key}".encode("utf-8"))
+        return self.directory / f"{digest.hexdigest()}.json"
@@ -2,7 +2,6 @@ import base64
 import binascii
 import json
 import os
-from functools import lru_cache
 from typing import List
 
 from google.api_core.exceptions import PermissionDenied
@@ -11,26 +10,33 @@ from google.cloud import secretmanager, storage  # type: ignore
 from google.oauth2 import service_account
 from loguru import logger
 
+from velo_action.cache import TTLCache
+
 
 class GCP:
     def __init__(self, project: str, service_account_key=None):
         self.scoped_credentials = None
         self.project = project
+        self._clients = TTLCache(maxsize=2)
         if service_account_key:
             self._auth_service_account(service_account_key)
         else:
             logger.info("Using local credentials.")
 
-    @lru_cache(maxsize=128)  # noqa: B019
     def _get_storage_client(self):
+        return self._clients.get_or_set("storage", self._create_storage_client)
+
+    def _get_secrets_client(self):
+        return self._clients.get_or_set("secrets", self._create_secrets_client)
+
+    def _create_storage_client(self):
         logger.info(f"project {self.project}")
         client = storage.Client(
             credentials=self.scoped_credentials, project=self.project
         )
         return client
 
-    @lru_cache(maxsize=128)  # noqa: B019
-    def _get_secrets_client(self):
+    def _create_secrets_client(self):
         try:
             secrets_client = secretmanager.SecretManagerServiceClient(
                 credentials=self.scoped_credentials,
@@ -1,14 +1,33 @@
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pydantic
 from loguru import logger
 
 from velo_action import gcp, github
-from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.client import DEFAULT_POOL_SIZE, OctopusClient
 from velo_action.octopus.deployment import Deployment
+from velo_action.octopus.plan import (
+    count_requests,
+    form_variable_requests,
+    format_plan,
+    plan_targets,
+    raise_for_invalid_plan,
+)
+from velo_action.octopus.poller import ProgressionPoller
 from velo_action.octopus.release import Release
+from velo_action.octopus.response_cache import ResponseCache
+from velo_action.octopus.retry import RetryPolicy
+from velo_action.octopus.rollout import (
+    Wave,
+    deploy_waves,
+    deployment_targets,
+    parse_rollout_plan,
+    raise_for_failures,
+)
+from velo_action.octopus.throttle import Throttle
 from velo_action.settings import (
     VELO_TRACE_ID_NAME,
     ActionInputs,
@@ -41,6 +60,7 @@ def action(  # pylint: disable=too-many-branches,too-many-locals,too-many-statem
     This should not produce an error when initialising the tracing.
     """
     init_trace = False
+    trace_id = None
 
     if args.service_account_key:
         # Do not init tracer when action is running without a
@@ -60,7 +80,21 @@ def action(  # pylint: disable=too-many-branches,too-many-locals,too-many-statem
             trace_id = None
             logger.warning(f"Starting trace failed: {error}", exc_info=error)
 
-    if args.create_release or args.deploy_to_environments:
+    waves = []
+    if args.rollout_plan:
+        waves = parse_rollout_plan(args.rollout_plan, args.max_parallel_deployments)
+    elif args.deploy_to_environments:
+        waves = [
+            Wave(tuple(args.deploy_to_environments), args.max_parallel_deployments)
+        ]
+    targets = [
+        target
+        for wave in waves
+        for target in deployment_targets(wave.environments, args.tenants)
+    ]
+    max_parallel = max((w.max_parallel or len(targets) for w in waves), default=1)
+
+    if args.create_release or waves:
         deploy_folder = Path.joinpath(Path(args.workspace), VELO_DEPLOY_FOLDER_NAME)  # type: ignore
         if not deploy_folder.is_dir():
             sys.exit(
@@ -68,6 +102,7 @@ def action(  # pylint: disable=too-many-branches,too-many-locals,too-many-statem
             )
 
         os.chdir(args.workspace)  # type: ignore
+        velo_settings = read_velo_settings(deploy_folder)
 
         gcloud = gcp.GCP(
             project=args.velo_project, service_account_key=args.service_account_key
@@ -81,18 +116,49 @@ def action(  # pylint: disable=too-many-branches,too-many-locals,too-many-statem
         velo_artifact_bucket = gcloud.lookup_data(
             args.velo_artifact_bucket_secret, args.velo_project
         )
-        octo = OctopusClient(server=octopus_server, api_key=octopus_api_key)
+        octo = OctopusClient(
+            server=octopus_server,
+            api_key=octopus_api_key,
+            pool_size=max(DEFAULT_POOL_SIZE, max_parallel),
+            cache_dir=args.octopus_cache_dir,
+            cache_ttl=args.octopus_cache_ttl_seconds,
+            feed_cache_ttl=args.octopus_feed_cache_ttl_seconds,
+            response_cache=ResponseCache.from_mode(
+                args.octopus_response_cache,
+                maxsize=args.octopus_response_cache_size,
+                directory=args.octopus_cache_dir,
+                namespace=octopus_server,
+            ),
+            retry_policy=RetryPolicy(
+                max_retries=args.octopus_max_retries,
+                max_total_seconds=args.octopus_retry_max_seconds,
+            ),
+            throttle=Throttle(
+                max_requests_per_second=args.octopus_max_requests_per_second,
+                max_in_flight=args.octopus_max_in_flight,
+            ),
+            timeout=(
+                args.octopus_connect_timeout_seconds,
+                args.octopus_read_timeout_seconds,
+            ),
+        )
+        if init_trace:
+            octo.set_trace_parent(span)
 
+    release = None
+    # Requests left out when planning
+    requests_skipped = 0
     if args.create_release:
-        release = Release(client=octo)
-
-        velo_settings = read_velo_settings(deploy_folder)
-
-        release_exists = release.exists(
-            project_name=velo_settings.project, version=args.version, client=octo
+        # Set by the settings validator when not given
+        assert args.version
+        version: str = args.version
+        # An existing release is reused for the deployments. Its files are not
+        # uploaded again, as that would change the release.
+        release = Release.find(
+            version=args.version, client=octo, project_name=velo_settings.project
         )
 
-        if release_exists:
+        if release:
             logger.info(
                 f"Release '{args.version}' already exists at "
                 f"'{release.client.baseurl}/app#/Spaces-1/projects/"
@@ -100,62 +166,122 @@ def action(  # pylint: disable=too-many-branches,too-many-locals,too-many-statem
                 "If you want to recreate this release, please delete it first in Octopus Deploy."
                 "Project -> Releases -> <Select Release> -> : menu in top right corner -> Delete. "
             )
+        elif args.plan:
+            release = Release(client=octo)
+            logger.info(
+                f"Plan: upload the release files to '{velo_artifact_bucket}/"
+                f"{velo_settings.project}/{args.version}' and create release "
+                f"'{args.version}' of project '{velo_settings.project}'"
+            )
+            release.plan(
+                project_name=velo_settings.project,
+                project_version=version,
+                github_settings=github_settings,
+            )
+            requests_skipped += 1
         else:
-            files = gcloud.upload_from_directory(
-                path=deploy_folder,
-                dest_bucket_name=velo_artifact_bucket,
-                dest_blob_name=f"{velo_settings.project}/{args.version}",
+            release = Release(client=octo)
+            logger.info(
+                f"Creating a release in Octopus Deploy for project '{velo_settings.project}' with version '{args.version}'"
             )
+            # The artifacts are uploaded while the release is prepared, and
+            # the release is only created once both are done
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload") as pool:
+                upload = pool.submit(
+                    gcloud.upload_from_directory,
+                    path=deploy_folder,
+                    dest_bucket_name=velo_artifact_bucket,
+                    dest_blob_name=f"{velo_settings.project}/{args.version}",
+                )
+                payload = release.build_payload(
+                    project_name=velo_settings.project,
+                    project_version=version,
+                    github_settings=github_settings,
+                )
+                files = upload.result()
 
             logger.info(
                 f"Uploaded {len(files)} release files to "
                 "'https://console.cloud.google.com/storage/browser/"
                 f"{velo_artifact_bucket}/{velo_settings.project}/{args.version}'"
             )
-
-            logger.info(
-                f"Creating a release in Octopus Deploy for project '{velo_settings.project}' with version '{args.version}'"
-            )
-            release.create(
-                project_name=velo_settings.project,
-                project_version=args.version,
-                github_settings=github_settings,
-            )
+            if not release.submit(payload):
+                logger.warning(
+                    f"Release '{args.version}' was created by someone else meanwhile. "
+                    "Using the existing release."
+                )
             logger.info(
                 f"See {release.client.baseurl}/app#/Spaces-1/projects/{velo_settings.project}/deployments/releases/{args.version}"
             )
 
-    if args.deploy_to_environments:
-        logger.info(f"Deploy to environments: {args.deploy_to_environments}")
+    if waves:
+        logger.info(f"Deploy in waves: {' -> '.join(str(w) for w in waves)}")
         deploy_vars = {}
         if trace_id:
             deploy_vars[VELO_TRACE_ID_NAME] = trace_id
 
-        tenants = args.tenants or [None]  # type: ignore
+        logger.info(
+            f"Deploying project '{velo_settings.project}' version '{args.version}'"
+        )
+        if not release:
+            release = Release.from_project_and_version(
+                version=args.version, client=octo, project_name=velo_settings.project
+            )
+        # Resolves all tenants together, picking the cheapest kind of lookup
+        octo.lookup_tenant_ids(args.tenants)
 
-        for env in args.deploy_to_environments:
-            for ten in tenants:
-                log = f"Deploying project '{velo_settings.project}' version '{args.version}' to '{env}' "
-                if ten:
-                    log += f"for tenant '{ten}'"
-                logger.info(log)
+        def deployment_factory():
+            return Deployment.from_release(
+                release,
+                client=octo,
+                form_variables_from_snapshot=(
+                    args.octopus_form_variables_source == "snapshot"
+                ),
+                log_tail=args.deployment_log_lines,
+            )
 
-                deploy = Deployment(
-                    project_name=velo_settings.project,
-                    version=args.version,
-                    client=octo,
+        if args.plan:
+            planned = plan_targets(targets, deployment_factory, variables=deploy_vars)
+            requests_skipped += len(targets)
+            if deploy_vars and not release.id():
+                # The form variables of a new release are only looked up by
+                # the real run
+                requests_skipped += form_variable_requests(
+                    targets, args.octopus_form_variables_source == "snapshot"
                 )
+            logger.info(format_plan(planned, count_requests(octo), requests_skipped))
+        else:
+            wave_results = deploy_waves(
+                waves,
+                args.tenants,
+                deployment_factory=deployment_factory,
+                wait_seconds=args.wait_for_success_seconds,
+                variables=deploy_vars,
+                poller=ProgressionPoller(octo) if max_parallel > 1 else None,
+                fail_fast=args.fail_fast,
+            )
+            deploy_results = [r for w in wave_results for r in w.results]
+            if len(targets) > 1:
+                logger.info("Deployment results:")
+                for wave_result in wave_results:
+                    logger.info(f"  {wave_result}")
+                    for result in wave_result.results:
+                        logger.info(f"    {result}")
 
-                deploy.create(
-                    env_name=env,
-                    tenant=ten,
-                    wait_seconds=args.wait_for_success_seconds,
-                    variables=deploy_vars,
-                )
+    if args.create_release or waves:
+        logger.info(f"Octopus Deploy request latency:\n{octo.latency.format_table()}")
+        retries = octo.retry_counts()
+        if retries:
+            logger.info(f"Octopus Deploy retried requests: {retries}")
 
-    if init_trace and (args.deploy_to_environments or args.create_release):
+    if init_trace and (waves or args.create_release):
         print_trace_link(span)
 
+    if waves and args.plan:
+        raise_for_invalid_plan(planned)
+    elif waves:
+        raise_for_failures(targets, deploy_results)
+
     output = ActionOutputs(version=args.version)
     # Set outputs in environment to be used by other
     # steps in the Github Action Workflows
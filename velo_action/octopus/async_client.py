@@ -0,0 +1,107 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from velo_action.octopus.client import DEFAULT_POOL_SIZE, OctopusClient
+
+
+class AsyncOctopusClient:
+    """
+    Asyncio counterpart of OctopusClient
+
+    Every call is executed on a bounded thread pool on top of a synchronous
+    OctopusClient. Both share the same pooled session, caches and error
+    handling, so independent requests can be awaited concurrently.
+    """
+
+    def __init__(self, client: OctopusClient, max_workers: int = DEFAULT_POOL_SIZE):
+        self.client = client
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="octopus"
+        )
+
+    @classmethod
+    async def connect(
+        cls, server=None, api_key=None, pool_size: int = DEFAULT_POOL_SIZE, **kwargs
+    ) -> "AsyncOctopusClient":
+        """
+        Create a client without blocking the event loop on the connection check
+
+        Further keyword arguments, like the caches, retry policy and throttle,
+        are passed on to OctopusClient.
+        """
+        client = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                OctopusClient,
+                server=server,
+                api_key=api_key,
+                pool_size=pool_size,
+                **kwargs,
+            ),
+        )
+        return cls(client, max_workers=pool_size)
+
+    def base_url(self):
+        return self.client.base_url()
+
+    async def get(self, path):
+        """
+        Get a resource
+
+        Returns parsed JSON on success.
+        Raises RuntimeError otherwise.
+        """
+        return await self._run(self.client.get, path)
+
+    async def head(self, path) -> bool:
+        """
+        Check existence of a resource
+
+        Returns boolean.
+        Raises RuntimeError.
+        """
+        return await self._run(self.client.head, path)
+
+    async def post(self, path, data):
+        """
+        Create a new resource
+
+        Returns parsed JSON on success.
+        Raises RuntimeError otherwise.
+        """
+        return await self._run(self.client.post, path, data)
+
+    async def lookup_environment_id(self, env_name) -> str:
+        """Translate environment name into an environment id"""
+        return await self._run(self.client.lookup_environment_id, env_name)
+
+    async def lookup_project_id(self, project_name) -> str:
+        """Translate project name into a project id"""
+        return await self._run(self.client.lookup_project_id, project_name)
+
+    async def lookup_tenant_id(self, tenant_name) -> str:
+        """Translate tenant name into a tenant id"""
+        return await self._run(self.client.lookup_tenant_id, tenant_name)
+
+    async def lookup_tenant_ids(self, tenant_names) -> Dict[str, str]:
+        """Translate tenant names into tenant ids. Unknown names are left out."""
+        return await self._run(self.client.lookup_tenant_ids, tenant_names)
+
+    def close(self):
+        """Wait for pending requests and close all pooled connections"""
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
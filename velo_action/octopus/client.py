@@ -1,20 +1,102 @@
+import copy
+import itertools
+import threading
+import time
 import urllib.parse
-from functools import lru_cache
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
 
 import requests
 from loguru import logger
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, set_span_in_context
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
+from velo_action.cache import DiskCache, TTLCache
+from velo_action.octopus.metrics import LatencyRecorder, path_template
+from velo_action.octopus.response_cache import ResponseCache
+from velo_action.octopus.retry import RetryPolicy
+from velo_action.octopus.singleflight import SingleFlight
+from velo_action.octopus.throttle import Throttle
+
+# Number of keep-alive connections kept open towards the Octopus server.
+# Should be at least the number of threads sharing a client.
+DEFAULT_POOL_SIZE = 10
+
+# Seconds to wait for a connection to the Octopus server, and for each read
+# of a response. A hung connection fails with requests.Timeout.
+DEFAULT_TIMEOUT = (10.0, 60.0)
+
+# Seconds a name to id lookup is cached
+DEFAULT_LOOKUP_CACHE_TTL = 24 * 60 * 60
+
+# Max number of name to id lookups kept in memory per client
+LOOKUP_CACHE_SIZE = 256
+
+# Seconds the versions of a feed package are reused without asking the server
+DEFAULT_FEED_CACHE_TTL = 5 * 60
+
+# Up to this many unknown tenant names are looked up with one filtered query
+# each. More names are resolved by downloading all tenants at once.
+FILTERED_LOOKUP_MAX_NAMES = 5
+FILTERED_LOOKUP_PAGE_SIZE = 30
+
+
+class OctopusRequestError(RuntimeError):
+    """An error response of the Octopus server"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class OctopusClient:
     baseurl: str = ""
-    _cached_environment_ids: dict = {}
-    _cached_tenant_ids: dict = {}
-    _headers: dict = {}
 
-    def __init__(self, server=None, api_key=None):
+    def __init__(
+        self,
+        server=None,
+        api_key=None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = True,
+        cache_dir=None,
+        cache_ttl: float = DEFAULT_LOOKUP_CACHE_TTL,
+        response_cache: Optional[ResponseCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        throttle: Optional[Throttle] = None,
+        feed_cache_ttl: float = DEFAULT_FEED_CACHE_TTL,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    ):
         self.baseurl = server
+        self._timeout = timeout
         self._headers = {"X-Octopus-ApiKey": f"{api_key}"}
+        self._session = self._create_session(pool_size, keep_alive)
+        self._lookup_cache = TTLCache(maxsize=LOOKUP_CACHE_SIZE, ttl=cache_ttl)
+        self._disk_cache = (
+            DiskCache(cache_dir, namespace=f"{server}", ttl=cache_ttl)
+            if cache_dir
+            else None
+        )
+        self._feed_cache_ttl = feed_cache_ttl
+        self._feed_cache = TTLCache(maxsize=LOOKUP_CACHE_SIZE, ttl=feed_cache_ttl)
+        self._feed_disk_cache = (
+            DiskCache(cache_dir, namespace=f"{server}", ttl=feed_cache_ttl)
+            if cache_dir and feed_cache_ttl
+            else None
+        )
+        self._response_cache = response_cache
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._retry_counts: Counter = Counter()
+        self._retry_lock = threading.Lock()
+        self._throttle = throttle or Throttle()
+        self.latency = LatencyRecorder()
+        self._in_flight_gets = SingleFlight()
+        # Incremented on every write, so reads never join a request that was
+        # sent before a write of the same client
+        self._writes = itertools.count()
+        self._write_generation = 0
+        self._trace_context = None
         self._verify_connection()
 
     def base_url(self):
@@ -24,10 +106,41 @@ class OctopusClient:
         """
         Get a resource
 
+        Concurrent requests for the same path share one request to the server.
+
         Returns parsed JSON on success.
         Raises RuntimeError otherwise.
         """
-        return self._request("get", path)
+        return self._in_flight_gets.do(
+            (path, self._write_generation), lambda: self._request("get", path)
+        )
+
+    def get_feed_versions(self, path):
+        """
+        Get a page of package versions of a feed, e.g.
+        'api/feeds/feeds-builtin/packages/versions?packageId=velo-bootstrapper&take=1'
+
+        Pages with versions are cached by space, feed, package and query, like
+        the pre-release filter, for `feed_cache_ttl` seconds in memory and in `cache_dir`.
+        Expired pages are requested again, which is a cheap conditional request
+        when the response is cached.
+        """
+        if not self._feed_cache_ttl:
+            return self.get(path)
+
+        key = _feed_versions_key(path)
+        versions = self._feed_cache.get(key)
+        if versions is None and self._feed_disk_cache:
+            versions = self._feed_disk_cache.get(key)
+        if versions is None:
+            versions = self.get(path)
+            # Without versions the package may be published any moment
+            if not versions or not versions.get("Items"):
+                return versions
+            self._feed_cache.set(key, versions)
+            if self._feed_disk_cache:
+                self._feed_disk_cache.set(key, versions)
+        return copy.deepcopy(versions)
 
     def head(self, path) -> bool:
         """
@@ -45,46 +158,258 @@ class OctopusClient:
         Returns parsed JSON on success.
         Raises RuntimeError otherwise.
         """
-        return self._request("post", path, data)
+        try:
+            return self._request("post", path, data)
+        finally:
+            self._write_generation = next(self._writes) + 1
 
     def lookup_environment_id(self, env_name) -> str:
-        """Translate project name into a project id"""
-        if not self._cached_environment_ids:
-            data = self.get("api/environments/all")
-            self._cached_environment_ids = {e["Name"]: e["Id"] for e in data}
-        if env_name not in self._cached_environment_ids:
+        """Translate environment name into an environment id"""
+        env_id = self._lookup_named_id("environments", env_name)
+        if not env_id:
             raise ValueError(f"Environment '{env_name}' is unknown")
-        return self._cached_environment_ids[env_name]
+        return env_id
 
-    @lru_cache(maxsize=128)  # noqa: B019
     def lookup_project_id(self, project_name) -> str:
         """Translate project name into a project id"""
-        pro = self.get(f"api/projects/{project_name}")
-        if not pro:
-            raise ValueError(f"Project '{project_name}' is unknown")
-        return pro["Id"]
+        return self._lookup_cache.get_or_set(
+            ("projects", project_name),
+            lambda: self._fetch_project_id(project_name),
+        )
 
     def lookup_tenant_id(self, tenant_name) -> str:
         """Translate tenant name into a tenant id"""
         if not tenant_name:
             return ""
-        if not self._cached_tenant_ids:
-            data = self.get("api/tenants/all")
-            self._cached_tenant_ids = {e["Name"]: e["Id"] for e in data}
-        if tenant_name not in self._cached_tenant_ids:
+        tenant_id = self.lookup_tenant_ids([tenant_name]).get(tenant_name)
+        if not tenant_id:
             raise ValueError(f"Tenant '{tenant_name}' is unknown")
-        return self._cached_tenant_ids[tenant_name]
+        return tenant_id
+
+    def lookup_tenant_ids(self, tenant_names: Iterable[str]) -> Dict[str, str]:
+        """
+        Translate tenant names into tenant ids. Unknown names are left out.
+
+        Names which are not cached are looked up with a filtered query each,
+        unless there are more than FILTERED_LOOKUP_MAX_NAMES of them. Then all
+        tenants are downloaded with one request instead.
+        """
+        names = {name for name in tenant_names if name}
+        ids, downloaded = self._cached_named_ids("tenants", names)
+        missing = names - ids.keys()
+        if missing and not downloaded:
+            if len(missing) <= FILTERED_LOOKUP_MAX_NAMES:
+                found = {}
+                for name in sorted(missing):
+                    tenant_id = self._fetch_tenant_id(name)
+                    if tenant_id:
+                        found[name] = tenant_id
+                ids = self._store_named_ids("tenants", found)
+            else:
+                ids = self._download_named_ids("tenants")
+        return {name: ids[name] for name in names if name in ids}
+
+    def retry_counts(self) -> dict:
+        """
+        Returns the number of retried requests by reason
+
+        The reason is either the response status code or the exception name.
+        """
+        with self._retry_lock:
+            return dict(self._retry_counts)
+
+    def set_trace_parent(self, span):
+        """Record all following requests as child spans of `span`"""
+        self._trace_context = set_span_in_context(span)
+
+    def invalidate_lookups(self):
+        """Forget all name to id lookups, both in memory and on disk"""
+        self._lookup_cache.invalidate()
+        if self._disk_cache:
+            for collection in ("environments", "projects", "tenants"):
+                self._disk_cache.delete(collection)
+
+    def _fetch_project_id(self, project_name) -> str:
+        # All project ids share one entry on disk, so they are invalidated
+        # together with the other collections
+        if self._disk_cache:
+            project_id = (self._disk_cache.get("projects") or {}).get(project_name)
+            if project_id:
+                return project_id
+
+        pro = self.get(f"api/projects/{project_name}")
+        if not pro:
+            raise ValueError(f"Project '{project_name}' is unknown")
+        if self._disk_cache:
+            self._disk_cache.set(
+                "projects",
+                {**(self._disk_cache.get("projects") or {}), project_name: pro["Id"]},
+            )
+        return pro["Id"]
+
+    def _fetch_tenant_id(self, tenant_name) -> Optional[str]:
+        """Find a tenant by name, paging through the tenants matching it partially"""
+        skip = 0
+        while True:
+            page = self.get(
+                f"api/tenants?partialName={urllib.parse.quote(tenant_name)}"
+                f"&skip={skip}&take={FILTERED_LOOKUP_PAGE_SIZE}"
+            )
+            for tenant in page["Items"]:
+                if tenant["Name"] == tenant_name:
+                    return tenant["Id"]
+            skip += len(page["Items"])
+            if not page["Items"] or skip >= page["TotalResults"]:
+                return None
+
+    def _lookup_named_id(self, collection, name) -> Optional[str]:
+        """
+        Returns the id of the resource called `name` in a collection
+
+        Names are looked up in memory first, then in the on-disk cache. If the
+        name is unknown to both, e.g. when a resource was added after the cache
+        was written, the collection is downloaded from the server once.
+        """
+        ids, downloaded = self._cached_named_ids(collection, [name])
+        if name in ids or downloaded:
+            return ids.get(name)
+        return self._download_named_ids(collection).get(name)
+
+    def _cached_named_ids(
+        self, collection, names: Iterable[str]
+    ) -> Tuple[Dict[str, str], bool]:
+        """
+        Returns the cached ids of a collection, and whether they are complete
+
+        The on-disk cache is only read if a name is not known in memory.
+        """
+        ids, downloaded = self._lookup_cache.get(collection, ({}, False))
+        if downloaded or not self._disk_cache or all(n in ids for n in names):
+            return ids, downloaded
+
+        ids = {**(self._disk_cache.get(collection) or {}), **ids}
+        self._lookup_cache.set(collection, (ids, False))
+        return ids, False
+
+    def _store_named_ids(self, collection, found: Dict[str, str]) -> Dict[str, str]:
+        """Add ids found by filtered lookups to the cached ids of a collection"""
+        ids, downloaded = self._lookup_cache.get(collection, ({}, False))
+        ids = {**ids, **found}
+        self._lookup_cache.set(collection, (ids, downloaded))
+        if self._disk_cache and found:
+            self._disk_cache.set(
+                collection, {**(self._disk_cache.get(collection) or {}), **found}
+            )
+        return ids
+
+    def _download_named_ids(self, collection) -> Dict[str, str]:
+        data = self.get(f"api/{collection}/all")
+        ids = {e["Name"]: e["Id"] for e in data}
+        self._lookup_cache.set(collection, (ids, True))
+        if self._disk_cache:
+            self._disk_cache.set(collection, ids)
+        return ids
 
     def _request(self, method, path, data=None):
         url = urllib.parse.urljoin(self.baseurl, path)
-        try:
-            response = requests.request(method, url, json=data, headers=self._headers)
-            logger.debug(
-                f"{response.request.method} {response.url}: {response.status_code}"
-            )
-        except RequestException as err:
-            raise RuntimeError(f"Error connecting to '{url}'. Invalid URL?") from err
-        return self._handle_response(response)
+        endpoint = f"{method.upper()} {path_template(path)}"
+        start = time.monotonic()
+        with trace.get_tracer(__name__).start_as_current_span(
+            f"octopus {endpoint}", context=self._trace_context, kind=SpanKind.CLIENT
+        ) as span:
+            span.set_attribute("http.method", method.upper())
+            span.set_attribute("http.route", path_template(path))
+            span.set_attribute("http.url", url)
+            try:
+                return self._perform(method, url, data, span)
+            finally:
+                self.latency.record(endpoint, time.monotonic() - start)
+
+    def _perform(self, method, url, data, span):
+        headers = self._headers
+        cached = None
+        if method == "get" and self._response_cache:
+            cached = self._response_cache.lookup(url)
+            if cached:
+                headers = {**headers, **cached.conditional_headers()}
+
+        response = self._send(method, url, data, headers)
+        span.set_attribute("http.status_code", response.status_code)
+        span.set_attribute("http.response_content_length", len(response.content))
+
+        if cached and response.status_code == 304:
+            return cached.parsed()
+
+        result = self._handle_response(response)
+        if method == "get" and self._response_cache and response.content:
+            self._response_cache.store(url, response.headers, result)
+        return result
+
+    def _send(self, method, url, data, headers) -> requests.Response:
+        """Send a request, repeating it according to the retry policy"""
+        policy = self._retry_policy
+        deadline = time.monotonic() + policy.max_total_seconds
+        retry = 0
+        while True:
+            response, error = None, None
+            try:
+                with self._throttle.slot():
+                    response = self._session.request(
+                        method, url, json=data, headers=headers, timeout=self._timeout
+                    )
+                logger.debug(
+                    f"{response.request.method} {response.url}: {response.status_code}"
+                )
+            except RequestException as err:
+                error = err
+
+            retry += 1
+            if retry <= policy.max_retries and policy.is_retryable(
+                method, response, error
+            ):
+                delay = policy.delay(retry, response)
+                if time.monotonic() + delay <= deadline:
+                    reason = (
+                        str(response.status_code)
+                        if response is not None
+                        else type(error).__name__
+                    )
+                    with self._retry_lock:
+                        self._retry_counts[reason] += 1
+                    logger.info(
+                        f"{method.upper()} '{url}' failed with '{reason}'. "
+                        f"Retry {retry}/{policy.max_retries} in {delay:.1f}s"
+                    )
+                    time.sleep(delay)
+                    continue
+
+            if response is None:
+                raise RuntimeError(
+                    f"Error connecting to '{url}': {error}. Invalid URL?"
+                ) from error
+            return response
+
+    def close(self):
+        """Close all pooled connections"""
+        self._session.close()
+
+    @staticmethod
+    def _create_session(pool_size, keep_alive) -> requests.Session:
+        """
+        Create a session reusing TCP/TLS connections between requests
+
+        The session only holds the connection pool and is safe to share between
+        threads, since headers are passed explicitly with every request.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        return session
 
     def _verify_connection(self):
         try:
@@ -120,10 +445,25 @@ class OctopusClient:
             help_links = data.get("ParsedHelpLinks")
             if help_links:
                 err = err + f" ({help_links})"
-            raise RuntimeError(err)
+            raise OctopusRequestError(err, response.status_code)
 
         else:
-            raise RuntimeError(
+            raise OctopusRequestError(
                 f"{response.request.method} '{response.url}' failed with status "
-                f"'{response.status_code}'"
+                f"'{response.status_code}'",
+                response.status_code,
             )
+
+
+def _feed_versions_key(path) -> str:
+    """Cache key of a feed versions query, independent of the query order"""
+    parts = urllib.parse.urlsplit(path)
+    segments = parts.path.strip("/").split("/")
+    feeds = segments.index("feeds")
+    # Feed ids like 'feeds-builtin' are only unique within a space
+    space = "/".join(segments[1:feeds])
+    query = sorted(urllib.parse.parse_qsl(parts.query))
+    return (
+        f"{space}/feeds/{segments[feeds + 1]}/versions?"
+        f"{urllib.parse.urlencode(query)}"
+    )
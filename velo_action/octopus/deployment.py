@@ -1,12 +1,21 @@
 import enum
+import threading
 import typing
-from datetime import datetime, timedelta
-from time import sleep
+from datetime import timedelta
+from time import monotonic, sleep
 
 from loguru import logger
 
 from velo_action.octopus.client import OctopusClient
 from velo_action.octopus.release import Release
+from velo_action.octopus.task_log import TaskLogStream
+
+
+# Completion is polled often at first, to notice quick deployments early, and
+# less often the longer a deployment runs
+POLL_INTERVAL_INITIAL = 0.5
+POLL_INTERVAL_FACTOR = 1.5
+POLL_INTERVAL_MAX = 15.0
 
 
 class DeploymentState(enum.Enum):
@@ -19,17 +28,35 @@ class DeploymentState(enum.Enum):
 class Deployment:
     _octo_object: typing.Any = {}
     _release: Release = None
-
-    def __init__(self, project_name=None, version=None, client=None):
+    _cancel_requested = False
+    _cancel_sent = False
+
+    def __init__(
+        self,
+        project_name=None,
+        version=None,
+        client=None,
+        form_variables_from_snapshot=False,
+        log_tail=0,
+    ):
+        """
+        log_tail: Stream the task log while waiting for completion, downloading
+            up to this many recent lines per poll. 0 disables streaming.
+        """
         self.client: OctopusClient = client
+        # Guards the created deployment and the cancel flags, as `cancel` is
+        # called from other threads
+        self._cancel_lock = threading.Lock()
+        self.form_variables_from_snapshot = form_variables_from_snapshot
+        self.log_tail = log_tail
         if project_name and version:
             self._release = Release.from_project_and_version(
                 project_name=project_name, version=version, client=client
             )
 
     @classmethod
-    def from_release(cls, release, client):
-        dep = cls(client=client)
+    def from_release(cls, release, client, **kwargs):
+        dep = cls(client=client, **kwargs)
         dep._release = release
         return dep
 
@@ -39,24 +66,84 @@ class Deployment:
     def project_id(self) -> str:
         return self._release.project_id() if self._release else ""
 
+    def task_id(self) -> str:
+        return self._octo_object.get("TaskId", "")
+
     def release(self) -> Release:
         return self._release
 
     def release_id(self) -> str:
         return self._release.id() if self._release else ""
 
-    def create(self, env_name, tenant=None, wait_seconds=0, variables=None):
+    def create(  # pylint: disable=too-many-arguments
+        self, env_name, tenant=None, wait_seconds=0, variables=None, poller=None
+    ):
         """
         Deploy the current Release a specific env with an optional tenant
+
+        If a ProgressionPoller is given, the deployment is tracked by the poller,
+        which shares one progression download per project between deployments.
+        Deployments streaming their task log poll their own task instead.
         """
 
+        payload = self.build_payload(env_name, tenant, variables)
+        environment_id = payload["EnvironmentId"]
+        tenant_id = payload.get("TenantId", "")
+
+        if self._cancel_requested:
+            raise RuntimeError("Deployment was cancelled before it was created")
+
+        created = self.client.post("api/deployments", data=payload)
+        with self._cancel_lock:
+            self._octo_object = created
+            send_cancel = self._claim_cancel()
+        if send_cancel:
+            self._send_cancel()
+
+        logger.info(
+            f'Deployment URL: {self.client.base_url()}{self._octo_object["Links"]["Web"]}'
+        )
+
+        if not wait_seconds:
+            return
+
+        duration = timedelta(seconds=wait_seconds)
+        if poller and not (self.log_tail and self.task_id()):
+            result = poller.wait(
+                self,
+                duration=duration,
+                environment_id=environment_id,
+                tenant_id=tenant_id,
+            )
+        else:
+            result = self._wait_until_completed(
+                duration=duration,
+                environment_id=environment_id,
+                tenant_id=tenant_id,
+            )
+
+        if result == DeploymentState.SUCCESS:
+            logger.info("Deployment finished successfully")
+        elif result == DeploymentState.FAIL:
+            raise RuntimeError("Deployment completed with error")
+        elif result == DeploymentState.TIMEOUT:
+            raise TimeoutError("Time limit exceeded while waiting for deployment")
+        else:
+            raise RuntimeError(f"Unexpected state '{result}'")
+
+    def build_payload(self, env_name, tenant=None, variables=None) -> dict:
+        """
+        The request creating a deployment of the Release to an env and tenant
+
+        Form variables are left out if the Release does not exist yet.
+        """
         if not self._release:
             raise RuntimeError("Cannot create deployment. Release was not specified.")
 
         environment_id = self.client.lookup_environment_id(env_name)
         tenant_id = self.client.lookup_tenant_id(tenant)
 
-        payload = {
+        payload: dict = {
             "EnvironmentId": environment_id,
             "ProjectId": self.project_id(),
             "ReleaseId": self.release_id(),
@@ -65,34 +152,61 @@ class Deployment:
         if tenant:
             payload["TenantId"] = tenant_id
 
-        if variables:
+        if variables and self.release_id():
             payload["FormValues"] = self._build_form_variables(
                 environment_id, variables
             )
+        return payload
 
-        self._octo_object = self.client.post("api/deployments", data=payload)
-
-        logger.info(
-            f'Deployment URL: {self.client.base_url()}{self._octo_object["Links"]["Web"]}'
-        )
+    def cancel(self) -> None:
+        """
+        Cancel the server task of the deployment
 
-        if wait_seconds:
-            result = self._wait_until_completed(
-                duration=timedelta(seconds=wait_seconds),
-                environment_id=environment_id,
-                tenant_id=tenant_id,
-            )
-            if result == DeploymentState.SUCCESS:
-                logger.info("Deployment finished successfully")
-            elif result == DeploymentState.FAIL:
-                raise RuntimeError("Deployment completed with error")
-            elif result == DeploymentState.TIMEOUT:
-                raise TimeoutError("Time limit exceeded while waiting for deployment")
-            else:
-                raise RuntimeError(f"Unexpected state '{result}'")
+        A deployment not created yet is not created anymore, and one still
+        being created is cancelled as soon as it exists. The task is
+        cancelled only once.
+        """
+        with self._cancel_lock:
+            self._cancel_requested = True
+            send_cancel = self._claim_cancel()
+        if send_cancel:
+            self._send_cancel()
+
+    def _claim_cancel(self) -> bool:
+        """Whether the caller sends the requested cancel. Hold the cancel lock."""
+        if not self._cancel_requested or self._cancel_sent or not self.task_id():
+            return False
+        self._cancel_sent = True
+        return True
+
+    def _send_cancel(self) -> None:
+        self.client.post(f"api/tasks/{self.task_id()}/cancel", data={})
 
     def get_state(self, environment_id, tenant_id) -> DeploymentState:
         progression = self.client.get(f"api/projects/{self.project_id()}/progression")
+        return self.state_from_progression(progression, environment_id, tenant_id)
+
+    def get_task_state(self) -> DeploymentState:
+        """State of the server task executing this deployment"""
+        task = self.client.get(f"api/tasks/{self.task_id()}")
+        return self.state_from_task(task)
+
+    @staticmethod
+    def state_from_task(task) -> DeploymentState:
+        if not task["IsCompleted"]:
+            return DeploymentState.PROGRESS
+        if task["FinishedSuccessfully"]:
+            return DeploymentState.SUCCESS
+        logger.error(
+            f"Deployment task '{task['Id']}' ended in state '{task['State']}': "
+            f"{task.get('ErrorMessage', '')}"
+        )
+        return DeploymentState.FAIL
+
+    def state_from_progression(
+        self, progression, environment_id, tenant_id
+    ) -> DeploymentState:
+        """Find the state of this deployment in a project progression document"""
         dep_state = {}
 
         for rel in progression["Releases"]:
@@ -115,13 +229,15 @@ class Deployment:
             if dep_state:
                 break
 
+        if not dep_state:
+            # A new deployment may not be part of the progression yet
+            return DeploymentState.PROGRESS
         if dep_state["State"] == "Success":
             return DeploymentState.SUCCESS
         if dep_state["State"] in ["Executing", "Queued"]:
             return DeploymentState.PROGRESS
-        else:
-            print(dep_state)
-            return DeploymentState.FAIL
+        logger.error(f"Deployment ended in state '{dep_state['State']}'")
+        return DeploymentState.FAIL
 
     def _build_form_variables(self, environment_id, variables) -> dict:
         """
@@ -143,27 +259,48 @@ class Deployment:
     def _wait_until_completed(
         self, duration, environment_id, tenant_id
     ) -> DeploymentState:
+        """
+        Poll the deployment until it is completed, or `duration` has passed
+
+        The server task of the deployment is polled when known, as it is much
+        smaller than the project progression. With `log_tail` set, the task
+        details are polled instead, and new log lines are written as they come.
+        """
         logger.info(f"Waiting up to {duration} for completion...")
-        start = datetime.now()
+        deadline = monotonic() + duration.total_seconds()
+        interval = POLL_INTERVAL_INITIAL
+        log_stream = None
+        if self.task_id() and self.log_tail:
+            log_stream = TaskLogStream(self.client, self.task_id(), tail=self.log_tail)
 
         while True:
-            state = self.get_state(environment_id=environment_id, tenant_id=tenant_id)
-            if state == DeploymentState.SUCCESS:
+            if log_stream:
+                state = self.state_from_task(log_stream.poll())
+            elif self.task_id():
+                state = self.get_task_state()
+            else:
+                state = self.get_state(
+                    environment_id=environment_id, tenant_id=tenant_id
+                )
+            if state in (DeploymentState.SUCCESS, DeploymentState.FAIL):
                 return state
-            if datetime.now() > start + duration:
+
+            remaining = deadline - monotonic()
+            if remaining <= 0:
                 return DeploymentState.TIMEOUT
-            sleep(1)
+            sleep(min(interval, remaining))
+            interval = min(interval * POLL_INTERVAL_FACTOR, POLL_INTERVAL_MAX)
 
     def _variable_name_to_id_mapping(self, environment_id):
         """
         Returns mapping of form variable names to their id
 
-        The mapping does also exist in the VariableSet (api/variables/variableset-*)
-        but that endpoint requires additional permissions.
+        The mapping is read from the deployment preview of the environment,
+        or from the project variable snapshot (api/variables/variableset-*) if
+        `form_variables_from_snapshot` is set. The latter is the same for all
+        environments but requires additional permissions. Both are cached by
+        the Release.
         """
-        preview = self.client.get(
-            f"api/releases/{self.release_id()}/deployments/preview/{environment_id}"
-        )
-        form_elements = preview["Form"]["Elements"]
-
-        return {e["Control"]["Name"]: e["Name"] for e in form_elements}
+        if self.form_variables_from_snapshot:
+            return self._release.form_variable_id_mapping()
+        return self._release.deployment_form_variable_mapping(environment_id)
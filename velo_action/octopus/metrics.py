@@ -0,0 +1,109 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+# Path segments that are part of the Octopus API itself. All other segments
+# are names, versions or ids, and are replaced by a placeholder.
+_API_WORDS = {
+    "all",
+    "api",
+    "cancel",
+    "deploymentprocesses",
+    "deployments",
+    "details",
+    "environments",
+    "feeds",
+    "packages",
+    "preview",
+    "progression",
+    "projects",
+    "raw",
+    "releases",
+    "template",
+    "tenants",
+    "tasks",
+    "variables",
+    "versions",
+}
+
+
+def path_template(path: str) -> str:
+    """
+    Returns the endpoint of an API path, e.g. 'api/projects/{id}/progression'
+
+    The query string is dropped and names, versions and ids are replaced by
+    '{id}', so all requests to the same endpoint share one template.
+    """
+    path = path.split("?", 1)[0].strip("/")
+    segments = []
+    for segment in path.split("/"):
+        if segment.lower() in _API_WORDS:
+            segments.append(segment)
+        else:
+            segments.append("{id}")
+    return "/".join(segments)
+
+
+class EndpointStats(NamedTuple):
+    endpoint: str
+    calls: int
+    p50: float
+    p95: float
+    max: float
+
+
+class LatencyRecorder:
+    """Thread-safe collection of request durations in seconds per endpoint"""
+
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._durations[endpoint].append(seconds)
+
+    def stats(self) -> List[EndpointStats]:
+        """Returns the latency per endpoint, slowest total time first"""
+        with self._lock:
+            durations = {k: sorted(v) for k, v in self._durations.items()}
+
+        stats = [
+            EndpointStats(
+                endpoint=endpoint,
+                calls=len(values),
+                p50=percentile(values, 50),
+                p95=percentile(values, 95),
+                max=values[-1],
+            )
+            for endpoint, values in durations.items()
+        ]
+        return sorted(stats, key=lambda s: s.p50 * s.calls, reverse=True)
+
+    def format_table(self) -> str:
+        rows = [("Endpoint", "Calls", "p50 (ms)", "p95 (ms)", "max (ms)")]
+        for stat in self.stats():
+            rows.append(
+                (
+                    stat.endpoint,
+                    str(stat.calls),
+                    f"{stat.p50 * 1000:.0f}",
+                    f"{stat.p95 * 1000:.0f}",
+                    f"{stat.max * 1000:.0f}",
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
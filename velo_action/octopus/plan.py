@@ -0,0 +1,86 @@
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment
+from velo_action.octopus.rollout import DeploymentTarget
+
+
+class PlannedDeployment(NamedTuple):
+    target: DeploymentTarget
+    payload: Optional[dict]
+    error: Optional[Exception]
+
+    def __str__(self) -> str:
+        if self.error:
+            return f"'{self.target}' is invalid: {self.error}"
+        assert self.payload is not None
+        return (
+            f"'{self.target}': EnvironmentId={self.payload['EnvironmentId']} "
+            f"TenantId={self.payload.get('TenantId', '-')} "
+            f"ReleaseId={self.payload['ReleaseId'] or '(new)'}"
+        )
+
+
+def plan_targets(
+    targets: Iterable[DeploymentTarget],
+    deployment_factory: Callable[[], Deployment],
+    variables=None,
+) -> List[PlannedDeployment]:
+    """
+    Build the 'api/deployments' request of every target without sending it
+
+    Resolving all names at once reports every unknown environment or tenant,
+    instead of only the first one.
+    """
+    planned = []
+    for target in targets:
+        try:
+            payload = deployment_factory().build_payload(
+                target.environment, target.tenant, variables
+            )
+            planned.append(PlannedDeployment(target, payload, None))
+        except Exception as err:  # pylint: disable=broad-except
+            planned.append(PlannedDeployment(target, None, err))
+    return planned
+
+
+def count_requests(client: OctopusClient) -> int:
+    """Number of requests sent by the client so far"""
+    return sum(stat.calls for stat in client.latency.stats())
+
+
+def form_variable_requests(
+    targets: Iterable[DeploymentTarget], from_snapshot: bool
+) -> int:
+    """
+    Number of requests looking up the form variables of the deployments
+
+    The snapshot is downloaded once per release, the preview once per
+    environment.
+    """
+    if from_snapshot:
+        return 1
+    return len({target.environment for target in targets})
+
+
+def format_plan(
+    planned: List[PlannedDeployment], requests_sent: int, requests_skipped: int
+) -> str:
+    lines = [f"Plan of {len(planned)} deployments:"]
+    lines.extend(f"  {p}" for p in planned)
+    lines.append(
+        f"Planning sent {requests_sent} requests to Octopus Deploy. "
+        f"The real run sends {requests_sent + requests_skipped}, "
+        "plus the polling while waiting for deployments."
+    )
+    return "\n".join(lines)
+
+
+def raise_for_invalid_plan(planned: List[PlannedDeployment]):
+    """Raise a RuntimeError listing all targets that cannot be deployed"""
+    invalid = [p for p in planned if p.error]
+    if invalid:
+        raise RuntimeError(
+            f"{len(invalid)} of {len(planned)} planned deployments are invalid: "
+            + "; ".join(str(p) for p in invalid)
+        ) from invalid[0].error
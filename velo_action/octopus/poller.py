@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment, DeploymentState
+
+_TERMINAL_STATES = (DeploymentState.SUCCESS, DeploymentState.FAIL)
+
+
+class _Waiter:
+    def __init__(self, deployment: Deployment, environment_id, tenant_id):
+        self.deployment = deployment
+        self.environment_id = environment_id
+        self.tenant_id = tenant_id
+        self.state: Optional[DeploymentState] = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class ProgressionPoller:
+    """
+    Tracks the state of many deployments with one progression request per project
+
+    Deployments waiting for completion register with the poller. On every tick
+    a background thread downloads the progression of each project with waiting
+    deployments once, and hands the state to all of them. The thread stops as
+    soon as every registered deployment is done.
+    """
+
+    def __init__(self, client: OctopusClient, interval: float = 1.0):
+        self.client = client
+        self.interval = interval
+        self._waiters: Dict[str, List[_Waiter]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def wait(
+        self, deployment: Deployment, duration: timedelta, environment_id, tenant_id
+    ) -> DeploymentState:
+        """Block until the deployment succeeded or failed, or `duration` passed"""
+        logger.info(f"Waiting up to {duration} for completion...")
+        waiter = _Waiter(deployment, environment_id, tenant_id)
+        with self._lock:
+            self._waiters[deployment.project_id()].append(waiter)
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="progression-poller", daemon=True
+                )
+                self._thread.start()
+
+        if not waiter.done.wait(timeout=duration.total_seconds()):
+            self._unregister(waiter)
+            return DeploymentState.TIMEOUT
+        if waiter.error:
+            raise waiter.error
+        assert waiter.state
+        return waiter.state
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                projects = {p: list(w) for p, w in self._waiters.items() if w}
+                if not projects:
+                    self._thread = None
+                    return
+
+            for project_id, waiters in projects.items():
+                self._poll(project_id, waiters)
+
+            time.sleep(self.interval)
+
+    def _poll(self, project_id, waiters: List[_Waiter]) -> None:
+        try:
+            progression = self.client.get(f"api/projects/{project_id}/progression")
+        except Exception as err:  # pylint: disable=broad-except
+            for waiter in waiters:
+                waiter.error = err
+                self._finish(waiter)
+            return
+
+        for waiter in waiters:
+            try:
+                waiter.state = waiter.deployment.state_from_progression(
+                    progression, waiter.environment_id, waiter.tenant_id
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                waiter.error = err
+            if waiter.error or waiter.state in _TERMINAL_STATES:
+                self._finish(waiter)
+
+    def _finish(self, waiter: _Waiter) -> None:
+        self._unregister(waiter)
+        waiter.done.set()
+
+    def _unregister(self, waiter: _Waiter) -> None:
+        with self._lock:
+            waiters = self._waiters[waiter.deployment.project_id()]
+            if waiter in waiters:
+                waiters.remove(waiter)
@@ -1,9 +1,13 @@
-from typing import Dict, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterator, List, Optional
 
 from semantic_version import Version
 
-from velo_action.octopus.client import OctopusClient
+from velo_action.cache import TTLCache
+from velo_action.octopus.client import OctopusClient, OctopusRequestError
 from velo_action.settings import GithubSettings
+from velo_action.utils import VersionIndex
 
 _RELEASE_REGEX = r"^(|\+.*)$"
 
@@ -15,12 +19,24 @@ VELO_BOOTSTRAPPER_ACTION_NAME = "run velo"
 # https://octopusdeploy.prod.nube.tech/app#/Spaces-1/library/builtinrepository/versions/velo-bootstrapper
 VELO_BOOTSTRAPPER_PACKAGE_ID = "velo-bootstrapper"
 
+# Max number of package versions looked up concurrently
+PACKAGE_LOOKUP_WORKERS = 8
+
+# Number of package versions downloaded per request
+FEED_VERSIONS_PAGE_SIZE = 100
+
 
 class Release:
     _octo_object: dict = {}
 
     def __init__(self, client=None):
         self.client: OctopusClient = client
+        self._form_variable_mappings = TTLCache()
+        # One lock per mapping serializes identical downloads, so concurrent
+        # deployments share one, while different environments load in parallel
+        self._form_variable_locks: Dict[Hashable, threading.Lock] = {}
+        self._form_variable_lock = threading.Lock()
+        self._version_index: Optional[VersionIndex] = None
 
     @classmethod
     def from_project_and_version(
@@ -33,6 +49,27 @@ class Release:
         rel._octo_object = client.get(f"api/projects/{project_id}/releases/{version}")
         return rel
 
+    @classmethod
+    def find(
+        cls, version, client: OctopusClient, project_name=None, project_id=None
+    ) -> Optional["Release"]:
+        """
+        Returns the release of a project version, or None if it does not exist
+
+        Unlike `exists`, one request both checks and downloads the release.
+        An unknown project raises, like `exists`.
+        """
+        if not project_id:
+            project_id = client.lookup_project_id(project_name)
+        try:
+            rel = cls.from_project_and_version(version, client, project_id=project_id)
+        except OctopusRequestError as err:
+            if err.status_code == 404:
+                return None
+            raise
+        # Error responses without a body are returned as False
+        return rel if rel._octo_object else None
+
     def id(self) -> str:  # pylint: disable=invalid-name
         return self._octo_object.get("Id", "")
 
@@ -48,8 +85,56 @@ class Release:
         project_version: str,
         github_settings: GithubSettings,
         auto_select_packages: bool = True,
-    ) -> None:
+    ) -> bool:
+        return self.submit(
+            self.build_payload(
+                project_name, project_version, github_settings, auto_select_packages
+            )
+        )
 
+    def submit(self, payload: dict) -> bool:
+        """
+        Create the release described by a payload from `build_payload`
+
+        If the version was created meanwhile, e.g. by a concurrent run of the
+        workflow, the existing release is downloaded instead. Returns False
+        in that case.
+        """
+        try:
+            self._octo_object = self.client.post("api/releases", data=payload)
+            return True
+        except OctopusRequestError as err:
+            if err.status_code not in (400, 409) or "already exists" not in str(err):
+                raise
+        self._octo_object = self.client.get(
+            f"api/projects/{payload['ProjectId']}/releases/{payload['Version']}"
+        )
+        return False
+
+    def plan(
+        self,
+        project_name: str,
+        project_version: str,
+        github_settings: GithubSettings,
+        auto_select_packages: bool = True,
+    ) -> dict:
+        """
+        Prepare the release like `create`, but without creating it
+
+        Returns the payload that would be posted. The Release has no id.
+        """
+        self._octo_object = self.build_payload(
+            project_name, project_version, github_settings, auto_select_packages
+        )
+        return self._octo_object
+
+    def build_payload(
+        self,
+        project_name: str,
+        project_version: str,
+        github_settings: GithubSettings,
+        auto_select_packages: bool = True,
+    ) -> dict:
         project_id = self.client.lookup_project_id(project_name)
         if auto_select_packages:
             packages = self._determine_latest_deploy_packages(project_id)
@@ -64,8 +149,7 @@ class Release:
 
         if packages:
             payload["SelectedPackages"] = packages
-
-        self._octo_object = self.client.post("api/releases", data=payload)
+        return payload
 
     @classmethod
     def _create_octopus_package_payload(
@@ -77,7 +161,34 @@ class Release:
     def form_variable_id_mapping(self) -> dict:
         """
         Returns a dict that maps all Project variable names to their variable id
+
+        The mapping is downloaded once per Release.
+        """
+        return self._cached_form_variables(
+            "snapshot", self._fetch_snapshot_variable_ids
+        )
+
+    def deployment_form_variable_mapping(self, environment_id) -> dict:
         """
+        Returns a dict that maps the form variable names of a deployment to an
+        environment to their id
+
+        The mapping is downloaded from the deployment preview once per
+        environment, so deployments to several tenants share it. The preview
+        only requires deployment permissions, unlike the variable snapshot.
+        """
+        return self._cached_form_variables(
+            ("preview", environment_id),
+            lambda: self._fetch_preview_variable_ids(environment_id),
+        )
+
+    def _cached_form_variables(self, key: Hashable, fetch: Callable[[], dict]) -> dict:
+        with self._form_variable_lock:
+            lock = self._form_variable_locks.setdefault(key, threading.Lock())
+        with lock:
+            return self._form_variable_mappings.get_or_set(key, fetch)
+
+    def _fetch_snapshot_variable_ids(self) -> dict:
         links = self._octo_object["Links"]
         path = links["ProjectVariableSnapshot"]
         project_vars = self.client.get(path)
@@ -85,48 +196,99 @@ class Release:
         var_ids = {v["Name"]: v["Id"] for v in variables}
         return var_ids
 
+    def _fetch_preview_variable_ids(self, environment_id) -> dict:
+        preview = self.client.get(
+            f"api/releases/{self.id()}/deployments/preview/{environment_id}"
+        )
+        form_elements = preview["Form"]["Elements"]
+        return {e["Control"]["Name"]: e["Name"] for e in form_elements}
+
     def _determine_latest_deploy_packages(self, project_id) -> List[Dict[str, str]]:
         """
         A release needs to specify the version of all deployment steps. We fetch
         the latest version by selecting the highest available SemVer.
+
+        The versions are looked up concurrently, once per feed and package.
         """
         template: dict = self.client.get(
             f"api/projects/{project_id}/deploymentprocesses/template"
         )
 
-        packages = []
-        for pkg in template["Packages"]:
-            ver = self.client.get(
-                f"api/feeds/{pkg['FeedId']}/packages/versions?"
-                f"packageId={pkg['PackageId']}&preReleaseTag={_RELEASE_REGEX}&take=1"
+        # Steps deploying the same package share one lookup
+        feed_packages = list(
+            dict.fromkeys(
+                (pkg["FeedId"], pkg["PackageId"]) for pkg in template["Packages"]
             )
+        )
+        if not feed_packages:
+            return []
 
-            packages.append(
-                {
-                    "ActionName": (pkg["ActionName"]),
-                    "Version": ver["Items"][0]["Version"],
-                }
+        with ThreadPoolExecutor(
+            max_workers=min(PACKAGE_LOOKUP_WORKERS, len(feed_packages)),
+            thread_name_prefix="package-version",
+        ) as pool:
+            versions = dict(
+                zip(feed_packages, pool.map(self._latest_version, feed_packages))
             )
 
-        return packages
+        return [
+            {
+                "ActionName": pkg["ActionName"],
+                "Version": versions[(pkg["FeedId"], pkg["PackageId"])],
+            }
+            for pkg in template["Packages"]
+        ]
+
+    def _latest_version(self, feed_package) -> str:
+        feed_id, package_id = feed_package
+        ver = self.client.get_feed_versions(
+            f"api/feeds/{feed_id}/packages/versions?"
+            f"packageId={package_id}&preReleaseTag={_RELEASE_REGEX}&take=1"
+        )
+        return ver["Items"][0]["Version"]
 
     def list_available_deploy_packages(self) -> List[str]:
         """
         A release needs to specify the version of all deployment steps. We fetch
         the latest version by selecting the highest available SemVer.
         """
-        packages: dict = self.client.get(
-            (
+        return list(self.iter_available_deploy_packages())
+
+    def version_index(self) -> VersionIndex:
+        """
+        Returns the available versions of the velo-bootstrapper package, to
+        match any number of specs against
+
+        The versions are downloaded and parsed once per Release.
+        """
+        if self._version_index is None:
+            self._version_index = VersionIndex(self.iter_available_deploy_packages())
+        return self._version_index
+
+    def iter_available_deploy_packages(
+        self, page_size: int = FEED_VERSIONS_PAGE_SIZE
+    ) -> Iterator[str]:
+        """
+        Yields the released versions of the velo-bootstrapper package
+
+        The versions are downloaded one page at a time, newest first, until a
+        page is not full or all `TotalResults` versions were downloaded.
+        """
+        skip = 0
+        while True:
+            page: dict = self.client.get_feed_versions(
                 "api/Spaces-1/feeds/feeds-builtin/packages/versions?"
-                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&take=1000&includePreRelease=false&includeReleaseNotes=false"
+                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&skip={skip}&take={page_size}"
+                "&includePreRelease=false&includeReleaseNotes=false"
             )
-        )
-
-        versions = []
+            for pkg in page["Items"]:
+                yield pkg["Version"]
 
-        for pkg in packages["Items"]:
-            versions.append(pkg["Version"])
-        return versions
+            skip += len(page["Items"])
+            if len(page["Items"]) < page_size or skip >= page.get(
+                "TotalResults", float("inf")
+            ):
+                return
 
     @classmethod
     def exists(cls, project_name, version, client):
@@ -0,0 +1,89 @@
+import copy
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from velo_action.cache import DiskCache, TTLCache
+
+# Max number of responses kept by the response cache
+DEFAULT_RESPONSE_CACHE_SIZE = 256
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: Any
+
+    def conditional_headers(self) -> dict:
+        """Headers asking the server to only send the resource if it changed"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def parsed(self) -> Any:
+        """Returns a copy of the cached JSON, safe to be modified by the caller"""
+        return copy.deepcopy(self.body)
+
+
+class ResponseCache:
+    """
+    Cache of GET responses together with their ETag/Last-Modified validators
+
+    The validators are sent along with the next request for the same url, and
+    a '304 Not Modified' answer is served from the cache. Responses are kept
+    in memory, or on disk when a `directory` is given. At most `maxsize`
+    responses are kept, evicting the least recently used.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_RESPONSE_CACHE_SIZE,
+        directory=None,
+        namespace: str = "",
+    ):
+        self._store: Any
+        if directory:
+            self._store = DiskCache(
+                Path(directory) / "responses",
+                namespace=namespace,
+                ttl=None,
+                maxsize=maxsize,
+            )
+        else:
+            self._store = TTLCache(maxsize=maxsize)
+
+    @classmethod
+    def from_mode(
+        cls, mode: str, maxsize: int, directory=None, namespace: str = ""
+    ) -> Optional["ResponseCache"]:
+        """Create a cache for the mode 'none', 'memory' or 'disk'"""
+        if mode == "none":
+            return None
+        if mode == "disk":
+            if not directory:
+                raise ValueError("A cache directory is required to cache on disk")
+            return cls(maxsize=maxsize, directory=directory, namespace=namespace)
+        return cls(maxsize=maxsize)
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        entry = self._store.get(url)
+        if not entry:
+            return None
+        return CachedResponse(**entry)
+
+    def store(self, url: str, headers, body) -> None:
+        """Cache the parsed JSON body of a response if it has validators"""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        self._store.set(
+            url,
+            {
+                "etag": etag,
+                "last_modified": last_modified,
+                "body": copy.deepcopy(body),
+            },
+        )
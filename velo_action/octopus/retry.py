@@ -0,0 +1,80 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+
+# Responses indicating that the server is temporarily unable to respond
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# Only requests without side effects are repeated
+IDEMPOTENT_METHODS = ("get", "head")
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before repeating a failed Octopus request
+
+    Idempotent requests failing with one of `status_codes`, or with a
+    connection error, are repeated up to `max_retries` times. The delay grows
+    exponentially from `backoff_factor` up to `max_backoff` with full jitter,
+    unless the server asks for a specific delay through 'Retry-After'. No retry
+    is scheduled that would end later than `max_total_seconds` after the
+    first attempt.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30,
+        max_total_seconds: float = 120,
+        status_codes=RETRY_STATUS_CODES,
+        methods=IDEMPOTENT_METHODS,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_total_seconds = max_total_seconds
+        self.status_codes = status_codes
+        self.methods = methods
+
+    def is_retryable(
+        self,
+        method: str,
+        response: Optional[requests.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> bool:
+        if method.lower() not in self.methods:
+            return False
+        if error is not None:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+        return response is not None and response.status_code in self.status_codes
+
+    def delay(self, retry: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before the `retry`th retry, counting from 1"""
+        retry_after = parse_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return retry_after
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** (retry - 1))
+        return random.uniform(0, backoff)
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Returns the delay in seconds requested by a 'Retry-After' header
+
+    The header is either a number of seconds or an HTTP date.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,286 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+
+from velo_action.octopus.deployment import Deployment
+from velo_action.octopus.poller import ProgressionPoller
+
+
+class DeploymentTarget(NamedTuple):
+    environment: str
+    tenant: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.tenant:
+            return f"{self.environment}/{self.tenant}"
+        return self.environment
+
+
+class DeploymentResult(NamedTuple):
+    target: DeploymentTarget
+    deployment: Optional[Deployment]
+    error: Optional[Exception]
+    duration: float
+    # Cancelled because a sibling deployment failed
+    cancelled: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def __str__(self) -> str:
+        if self.cancelled:
+            return f"'{self.target}' cancelled after {self.duration:.1f}s"
+        if self.error:
+            return f"'{self.target}' failed after {self.duration:.1f}s: {self.error}"
+        return f"'{self.target}' succeeded in {self.duration:.1f}s"
+
+
+class Wave(NamedTuple):
+    """
+    Environments deployed together, with up to `max_parallel` targets at a
+    time. A `max_parallel` of None deploys all targets of the wave at once.
+    """
+
+    environments: Tuple[str, ...]
+    max_parallel: Optional[int] = 1
+
+    def __str__(self) -> str:
+        return ", ".join(self.environments)
+
+
+class WaveResult(NamedTuple):
+    wave: Wave
+    results: List[DeploymentResult]
+    duration: float
+
+    @property
+    def succeeded(self) -> bool:
+        return all(r.succeeded for r in self.results)
+
+    def __str__(self) -> str:
+        failed = sum(1 for r in self.results if not r.succeeded)
+        status = f"{failed} failed" if failed else "succeeded"
+        return (
+            f"Wave '{self.wave}': {len(self.results)} deployments {status} "
+            f"in {self.duration:.1f}s"
+        )
+
+
+_WAVE_REGEX = re.compile(r"^(?P<environments>[^\[\]]+?)\s*(\[(?P<options>[^\]]*)\])?$")
+
+
+def parse_rollout_plan(plan: str, max_parallel: int = 1) -> List[Wave]:
+    """
+    Parse a rollout plan like 'dev -> staging -> prod[tenants in parallel, max 5]'
+
+    Waves are separated by '->' and deployed one after another. A wave lists
+    one or more environments separated by ',', optionally followed by options
+    in brackets:
+      'parallel' or 'tenants in parallel': deploy all targets at once
+      'sequential': deploy one target at a time
+      'max N': deploy up to N targets at a time
+    Waves without options deploy up to `max_parallel` targets at a time.
+    """
+    waves = []
+    for part in plan.split("->"):
+        match = _WAVE_REGEX.match(part.strip())
+        if not match:
+            raise ValueError(f"Invalid wave '{part.strip()}' in rollout plan '{plan}'")
+
+        environments = tuple(
+            e.strip() for e in match["environments"].split(",") if e.strip()
+        )
+        if not environments:
+            raise ValueError(f"Wave without environments in rollout plan '{plan}'")
+
+        wave_parallel: Optional[int] = max_parallel
+        limit = None
+        for option in (match["options"] or "").split(","):
+            option = " ".join(option.lower().split())
+            if not option:
+                continue
+            if option in ("parallel", "tenants in parallel"):
+                wave_parallel = None
+            elif option == "sequential":
+                wave_parallel = 1
+            elif re.fullmatch(r"max [1-9]\d*", option):
+                limit = int(option[4:])
+            else:
+                raise ValueError(
+                    f"Unknown option '{option}' of wave '{part.strip()}' in rollout plan"
+                )
+        waves.append(Wave(environments, limit or wave_parallel))
+    return waves
+
+
+def deployment_targets(environments, tenants) -> List[DeploymentTarget]:
+    """All environment and tenant combinations, in deployment order"""
+    return [
+        DeploymentTarget(env, tenant)
+        for env in environments
+        for tenant in (tenants or [None])
+    ]
+
+
+class _Cancellation:
+    """Cancels the running deployments of a rollout after the first failure"""
+
+    def __init__(self):
+        self.cancelled: Set[DeploymentTarget] = set()
+        self._triggered = False
+        self._running: Dict[DeploymentTarget, Deployment] = {}
+        self._lock = threading.Lock()
+
+    def start(self, target: DeploymentTarget, deployment: Deployment) -> bool:
+        """Register a deployment. Returns False if the rollout is cancelled"""
+        with self._lock:
+            if self._triggered:
+                return False
+            self._running[target] = deployment
+            return True
+
+    def finish(self, target: DeploymentTarget) -> None:
+        with self._lock:
+            self._running.pop(target, None)
+
+    def trigger(self, failed: DeploymentTarget) -> None:
+        with self._lock:
+            if self._triggered:
+                return
+            self._triggered = True
+            siblings = {t: d for t, d in self._running.items() if t != failed}
+            self.cancelled.update(siblings)
+
+        for target, deployment in siblings.items():
+            logger.warning(f"Cancelling deployment to '{target}'")
+            try:
+                deployment.cancel()
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning(f"Cancelling deployment to '{target}' failed: {err}")
+
+
+def deploy_targets(
+    targets: Iterable[DeploymentTarget],
+    deployment_factory: Callable[[], Deployment],
+    wait_seconds=0,
+    variables=None,
+    max_parallel: int = 1,
+    poller: Optional[ProgressionPoller] = None,
+    fail_fast: bool = False,
+) -> List[DeploymentResult]:
+    """
+    Deploy to every target and return the result of each
+
+    With `max_parallel` of 1 the targets are deployed one after another, and
+    no further targets are deployed after the first failure. Otherwise up to
+    `max_parallel` deployments run concurrently and every target is deployed
+    regardless of failing siblings. A `poller` lets all concurrently waiting
+    deployments share the progression requests.
+
+    With `fail_fast`, the first failing concurrent deployment cancels the
+    running ones, and the targets not started yet are not deployed.
+    """
+    cancellation = _Cancellation() if fail_fast and max_parallel > 1 else None
+
+    def deploy(target: DeploymentTarget) -> Optional[DeploymentResult]:
+        start = time.monotonic()
+        deployment = None
+        try:
+            deployment = deployment_factory()
+            if cancellation and not cancellation.start(target, deployment):
+                return None
+            logger.info(f"Deploying to '{target}'")
+            deployment.create(
+                env_name=target.environment,
+                tenant=target.tenant,
+                wait_seconds=wait_seconds,
+                variables=variables,
+                poller=poller,
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            duration = time.monotonic() - start
+            if cancellation and target in cancellation.cancelled:
+                logger.warning(f"Deployment to '{target}' was cancelled")
+                return DeploymentResult(target, deployment, err, duration, True)
+            logger.error(f"Deployment to '{target}' failed: {err}")
+            if cancellation:
+                cancellation.trigger(target)
+            return DeploymentResult(target, deployment, err, duration)
+        finally:
+            if cancellation:
+                cancellation.finish(target)
+        return DeploymentResult(target, deployment, None, time.monotonic() - start)
+
+    results: List[DeploymentResult] = []
+    if max_parallel <= 1:
+        for target in targets:
+            result = deploy(target)
+            assert result
+            results.append(result)
+            if not result.succeeded:
+                break
+        return results
+
+    with ThreadPoolExecutor(
+        max_workers=max_parallel, thread_name_prefix="deploy"
+    ) as pool:
+        return [r for r in pool.map(deploy, targets) if r]
+
+
+def deploy_waves(
+    waves: Iterable[Wave],
+    tenants,
+    deployment_factory: Callable[[], Deployment],
+    wait_seconds=0,
+    variables=None,
+    poller: Optional[ProgressionPoller] = None,
+    fail_fast: bool = False,
+) -> List[WaveResult]:
+    """
+    Deploy the waves one after another, each only if all previous succeeded
+    """
+    wave_results: List[WaveResult] = []
+    for wave in waves:
+        targets = deployment_targets(wave.environments, tenants)
+        logger.info(f"Starting wave '{wave}' with {len(targets)} deployments")
+        start = time.monotonic()
+        results = deploy_targets(
+            targets,
+            deployment_factory,
+            wait_seconds=wait_seconds,
+            variables=variables,
+            max_parallel=wave.max_parallel or len(targets),
+            poller=poller,
+            fail_fast=fail_fast,
+        )
+        wave_results.append(WaveResult(wave, results, time.monotonic() - start))
+        logger.info(str(wave_results[-1]))
+        if not wave_results[-1].succeeded:
+            break
+    return wave_results
+
+
+def raise_for_failures(
+    targets: List[DeploymentTarget], results: List[DeploymentResult]
+):
+    """Raise a RuntimeError listing all failed, cancelled and not attempted targets"""
+    failures = [r for r in results if not r.succeeded and not r.cancelled]
+    cancelled = [str(r.target) for r in results if r.cancelled]
+    if not failures and not cancelled:
+        return
+    attempted = {r.target for r in results}
+    skipped = [str(t) for t in targets if t not in attempted]
+
+    msg = f"{len(failures)} of {len(targets)} deployments failed: " + "; ".join(
+        str(r) for r in failures
+    )
+    if cancelled:
+        msg += f". Cancelled: {', '.join(cancelled)}"
+    if skipped:
+        msg += f". Not deployed: {', '.join(skipped)}"
+    raise RuntimeError(msg) from next(r.error for r in results if not r.succeeded)
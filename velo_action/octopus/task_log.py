@@ -0,0 +1,86 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from velo_action.octopus.client import OctopusClient
+
+# Number of most recent log lines per activity downloaded on every poll
+DEFAULT_TAIL = 100
+
+_LOG_LEVELS = {
+    "Fatal": "ERROR",
+    "Error": "ERROR",
+    "Warning": "WARNING",
+    "Verbose": "DEBUG",
+}
+
+
+def _emit_line(line: str, category: str) -> None:
+    logger.log(_LOG_LEVELS.get(category, "INFO"), line)
+
+
+class TaskLogStream:
+    """
+    Writes the new lines of an Octopus server task log on every poll
+
+    Octopus has no offset for task logs, so each poll downloads only the
+    `tail` most recent lines of every activity, which keeps the response size
+    constant. A cursor per activity, the last line written, tells which of
+    them are new. If more than `tail` lines were logged between two polls the
+    lines in between are skipped, and a marker is written instead.
+    """
+
+    def __init__(
+        self,
+        client: OctopusClient,
+        task_id: str,
+        tail: int = DEFAULT_TAIL,
+        emit: Callable[[str, str], None] = _emit_line,
+    ):
+        self.client = client
+        self.task_id = task_id
+        self.tail = tail
+        self.emit = emit
+        self._cursors: Dict[str, Tuple[str, str]] = {}
+
+    def poll(self) -> dict:
+        """Write the lines logged since the last poll. Returns the task resource"""
+        details = self.client.get(
+            f"api/tasks/{self.task_id}/details?verbose=false&tail={self.tail}"
+        )
+        for activity in _activities(details.get("ActivityLogs", [])):
+            self._emit_new_lines(activity)
+        return details["Task"]
+
+    def _emit_new_lines(self, activity: dict) -> None:
+        elements: List[dict] = activity.get("LogElements") or []
+        if not elements:
+            return
+
+        keys = [(e.get("OccurredAt", ""), e.get("MessageText", "")) for e in elements]
+        cursor = self._cursors.get(activity["Id"])
+        start = _index_after(keys, cursor) if cursor else 0
+        if start is None:
+            self.emit(f"[{activity.get('Name', '')}] ...", "Info")
+            start = 0
+
+        for element in elements[start:]:
+            self.emit(
+                f"[{activity.get('Name', '')}] {element.get('MessageText', '')}",
+                element.get("Category", "Info"),
+            )
+        self._cursors[activity["Id"]] = keys[-1]
+
+
+def _activities(activities: List[dict]) -> Iterator[dict]:
+    """All activities of a task log, depth first in log order"""
+    for activity in activities:
+        yield activity
+        yield from _activities(activity.get("Children") or [])
+
+
+def _index_after(keys: List[Tuple[str, str]], cursor: Tuple[str, str]) -> Optional[int]:
+    for index in range(len(keys) - 1, -1, -1):
+        if keys[index] == cursor:
+            return index + 1
+    return None
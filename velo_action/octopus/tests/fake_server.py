@@ -0,0 +1,540 @@
+"""
+In-process stand-in for the Octopus Deploy API used by velo-action
+
+Serves the environments, tenants, projects, releases, progression,
+deployments, preview, variables, feeds and tasks endpoints from memory, so
+OctopusClient, Release and Deployment can be exercised end-to-end and
+benchmarked without an Octopus server.
+
+Usage:
+    with FakeOctopusServer(tenants=["fc:osl1"]) as server:
+        client = OctopusClient(server=server.url, api_key="API-KEY")
+        ...
+        assert server.request_count("GET api/projects/{id}/progression") == 1
+
+Run `python -m velo_action.octopus.tests.fake_server` to serve it on a fixed
+port for manual load tests.
+"""
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from velo_action.octopus.metrics import path_template
+from velo_action.settings import VELO_TRACE_ID_NAME
+
+# States a deployment task passes through, one per poll
+DEFAULT_TASK_STATES = ("Queued", "Executing", "Success")
+
+_COMPLETED_TASK_STATES = ("Success", "Failed", "Canceled", "TimedOut")
+
+Response = Tuple[int, object, Dict[str, str]]
+
+
+class FakeOctopusServer:
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        environments: Iterable[str] = ("dev", "staging", "prod"),
+        tenants: Iterable[str] = (),
+        projects: Iterable[str] = ("ProjectName",),
+        packages: Optional[Dict[str, List[str]]] = None,
+        task_states: Iterable[str] = DEFAULT_TASK_STATES,
+        failing_targets: Iterable[Tuple[str, Optional[str]]] = (),
+        default_latency: float = 0.0,
+        latency: Optional[Dict[str, float]] = None,
+    ):
+        """
+        packages: Versions available per package id. Every project deploys
+            all packages, one step per package.
+        task_states: States of a deployment task, advancing on every read.
+        failing_targets: (environment name, tenant name or None) pairs whose
+            deployments end in the 'Failed' state.
+        latency: Seconds added to requests per endpoint, e.g.
+            {"GET api/projects/{id}/progression": 0.2}
+        """
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+        self.environments = {
+            name: self._new_id("Environments") for name in environments
+        }
+        self.tenants = {name: self._new_id("Tenants") for name in tenants}
+        self.projects = {
+            name: {"Id": self._new_id("Projects"), "Name": name} for name in projects
+        }
+        self.packages = packages or {"velo-bootstrapper": ["0.1.0", "0.2.0", "1.0.0"]}
+        self.task_states = tuple(task_states)
+        self.failing_targets = set(failing_targets)
+        self.default_latency = default_latency
+        self.latency = dict(latency or {})
+
+        self.releases: Dict[str, dict] = {}
+        self.deployments: Dict[str, dict] = {}
+        self.tasks: Dict[str, dict] = {}
+        self._task_polls: Counter = Counter()
+        self._errors: Dict[str, List[Tuple[int, Dict[str, str]]]] = defaultdict(list)
+
+        self.requests: List[Tuple[str, str]] = []
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # Server lifecycle
+
+    @property
+    def url(self) -> str:
+        assert self._httpd, "The server is not started"
+        return f"http://127.0.0.1:{self._httpd.server_port}/"
+
+    def start(self, port: int = 0) -> "FakeOctopusServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self  # type: ignore
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeOctopusServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # Test helpers
+
+    def inject_error(
+        self,
+        endpoint: str,
+        status: int = 503,
+        times: int = 1,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Answer the next `times` requests to an endpoint with `status`"""
+        with self._lock:
+            self._errors[endpoint].extend([(status, headers or {})] * times)
+
+    def request_count(self, endpoint: Optional[str] = None) -> int:
+        """Number of requests received, optionally only those to `endpoint`"""
+        with self._lock:
+            if endpoint is None:
+                return len(self.requests)
+            return sum(
+                1
+                for method, path in self.requests
+                if endpoint == _endpoint(method, path)
+            )
+
+    def reset_requests(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    # Request handling
+
+    def handle(self, method: str, path: str, body, headers) -> Response:
+        parts = urllib.parse.urlsplit(path)
+        route = re.sub(r"^api/Spaces-\d+/", "api/", parts.path.strip("/"))
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        endpoint = _endpoint(method, route)
+
+        with self._lock:
+            self.requests.append((method, route))
+            errors = self._errors.get(endpoint)
+            error = errors.pop(0) if errors else None
+        time.sleep(self.latency.get(endpoint, self.default_latency))
+
+        if error:
+            status, error_headers = error
+            return status, {"ErrorMessage": "Injected error"}, error_headers
+
+        for pattern, route_method, handler in _ROUTES:
+            match = pattern.match(route)
+            if match and route_method == method:
+                with self._lock:
+                    return handler(self, query, body, *match.groups())
+        return 404, {"ErrorMessage": f"No route for {method} {route}"}, {}
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}-{next(self._ids)}"
+
+    def _project(self, id_or_name) -> Optional[dict]:
+        for project in self.projects.values():
+            if id_or_name in (project["Id"], project["Name"]):
+                return project
+        return None
+
+    def _release(self, project_id, version) -> Optional[dict]:
+        for release in self.releases.values():
+            if release["ProjectId"] == project_id and release["Version"] == version:
+                return release
+        return None
+
+    def _advance_task(self, task_id) -> dict:
+        task = self.tasks[task_id]
+        if not task["IsCompleted"]:
+            self._task_polls[task_id] += 1
+            index = min(self._task_polls[task_id], len(self.task_states) - 1)
+            state = self.task_states[index]
+            if state == "Success" and task["_failing"]:
+                state = "Failed"
+            if state != task["State"]:
+                task["_log"].append(
+                    {
+                        "Category": "Error" if state == "Failed" else "Info",
+                        "MessageText": f"Task state changed to {state}",
+                        "OccurredAt": f"2023-01-01T00:00:{len(task['_log']):02d}Z",
+                    }
+                )
+            task["State"] = state
+            task["IsCompleted"] = state in _COMPLETED_TASK_STATES
+            task["FinishedSuccessfully"] = state == "Success"
+        return task
+
+    # Endpoints
+
+    def _api(self, _query, _body) -> Response:
+        return 200, {"Application": "Octopus Deploy (fake)"}, {}
+
+    def _all_environments(self, _query, _body) -> Response:
+        return 200, [{"Id": i, "Name": n} for n, i in self.environments.items()], {}
+
+    def _all_tenants(self, _query, _body) -> Response:
+        return 200, [{"Id": i, "Name": n} for n, i in self.tenants.items()], {}
+
+    def _tenants(self, query, _body) -> Response:
+        partial_name = query.get("partialName", "").lower()
+        items = [
+            {"Id": i, "Name": n}
+            for n, i in self.tenants.items()
+            if partial_name in n.lower()
+        ]
+        skip = int(query.get("skip", 0))
+        take = int(query.get("take", 30))
+        return (
+            200,
+            {
+                "Items": items[skip : skip + take],
+                "TotalResults": len(items),
+                "ItemsPerPage": take,
+            },
+            {},
+        )
+
+    def _get_project(self, _query, _body, id_or_name) -> Response:
+        project = self._project(id_or_name)
+        if not project:
+            return (
+                404,
+                {"ErrorMessage": "The resource you requested was not found."},
+                {},
+            )
+        return 200, project, {}
+
+    def _get_release(self, _query, _body, project_id, version) -> Response:
+        release = self._release(project_id, version)
+        if not release:
+            return (
+                404,
+                {"ErrorMessage": "The resource you requested was not found."},
+                {},
+            )
+        return 200, release, {}
+
+    def _create_release(self, _query, body) -> Response:
+        if self._release(body["ProjectId"], body["Version"]):
+            return (
+                400,
+                {
+                    "ErrorMessage": "There was a problem with your request.",
+                    "Errors": [
+                        f"A release with the version number '{body['Version']}' already exists."
+                    ],
+                },
+                {},
+            )
+        release_id = self._new_id("Releases")
+        release = {
+            "Id": release_id,
+            "ProjectId": body["ProjectId"],
+            "Version": body["Version"],
+            "ReleaseNotes": body.get("ReleaseNotes"),
+            "SelectedPackages": body.get("SelectedPackages", []),
+            "Links": {
+                "Self": f"/api/releases/{release_id}",
+                "ProjectVariableSnapshot": f"/api/variables/variableset-{release_id}",
+            },
+        }
+        self.releases[release_id] = release
+        return 201, release, {}
+
+    def _template(self, _query, _body, _project_id) -> Response:
+        packages = [
+            {
+                "ActionName": f"deploy {package}",
+                "FeedId": "feeds-builtin",
+                "PackageId": package,
+            }
+            for package in self.packages
+        ]
+        return 200, {"Packages": packages}, {}
+
+    def _feed_versions(self, query, _body, _feed_id) -> Response:
+        versions = self.packages.get(query.get("packageId", ""), [])
+        versions = sorted(versions, key=_version_key, reverse=True)
+        if (
+            query.get("includePreRelease", "true") == "false"
+            or "preReleaseTag" in query
+        ):
+            versions = [v for v in versions if "-" not in v]
+        skip = int(query.get("skip", 0))
+        take = int(query.get("take", 30))
+        items = [{"PackageId": query.get("packageId"), "Version": v} for v in versions]
+        return (
+            200,
+            {
+                "Items": items[skip : skip + take],
+                "TotalResults": len(items),
+                "ItemsPerPage": take,
+            },
+            {},
+        )
+
+    def _create_deployment(self, _query, body) -> Response:
+        deployment_id = self._new_id("Deployments")
+        task_id = self._new_id("ServerTasks")
+        env_name = next(
+            n for n, i in self.environments.items() if i == body["EnvironmentId"]
+        )
+        tenant_name = next(
+            (n for n, i in self.tenants.items() if i == body.get("TenantId")), None
+        )
+        self.tasks[task_id] = {
+            "Id": task_id,
+            "State": self.task_states[0],
+            "IsCompleted": False,
+            "FinishedSuccessfully": False,
+            "ErrorMessage": "",
+            "_failing": (env_name, tenant_name) in self.failing_targets,
+            "_log": [],
+        }
+        deployment = {
+            "Id": deployment_id,
+            "ReleaseId": body["ReleaseId"],
+            "ProjectId": body["ProjectId"],
+            "EnvironmentId": body["EnvironmentId"],
+            "TenantId": body.get("TenantId"),
+            "TaskId": task_id,
+            "FormValues": body.get("FormValues", {}),
+            "Links": {
+                "Web": f"/app#/Spaces-1/deployments/{deployment_id}",
+                "Task": f"/api/tasks/{task_id}",
+            },
+        }
+        self.deployments[deployment_id] = deployment
+        return 201, deployment, {}
+
+    def _preview(self, _query, _body, release_id, _environment_id) -> Response:
+        elements = [
+            {
+                "Name": f"{release_id}-{VELO_TRACE_ID_NAME}",
+                "Control": {"Name": VELO_TRACE_ID_NAME},
+            }
+        ]
+        return 200, {"Form": {"Values": {}, "Elements": elements}}, {}
+
+    def _variables(self, _query, _body, release_id) -> Response:
+        variables = [
+            {"Id": f"{release_id}-{VELO_TRACE_ID_NAME}", "Name": VELO_TRACE_ID_NAME}
+        ]
+        return 200, {"Id": f"variableset-{release_id}", "Variables": variables}, {}
+
+    def _progression(self, _query, _body, project_id) -> Response:
+        releases = []
+        for release in self.releases.values():
+            if release["ProjectId"] != project_id:
+                continue
+            deployments: Dict[str, list] = defaultdict(list)
+            for dep in self.deployments.values():
+                if dep["ReleaseId"] != release["Id"]:
+                    continue
+                task = self._advance_task(dep["TaskId"])
+                deployments[dep["EnvironmentId"]].append(
+                    {
+                        "DeploymentId": dep["Id"],
+                        "TenantId": dep["TenantId"],
+                        "TaskId": dep["TaskId"],
+                        "State": task["State"],
+                    }
+                )
+            releases.append({"Release": release, "Deployments": dict(deployments)})
+        return 200, {"Releases": releases}, {}
+
+    def _task(self, _query, _body, task_id) -> Response:
+        if task_id not in self.tasks:
+            return (
+                404,
+                {"ErrorMessage": "The resource you requested was not found."},
+                {},
+            )
+        task = self._advance_task(task_id)
+        return 200, _public(task), {}
+
+    def _cancel_task(self, _query, _body, task_id) -> Response:
+        if task_id not in self.tasks:
+            return (
+                404,
+                {"ErrorMessage": "The resource you requested was not found."},
+                {},
+            )
+        task = self.tasks[task_id]
+        if not task["IsCompleted"]:
+            task["State"] = "Canceled"
+            task["IsCompleted"] = True
+        return 200, _public(task), {}
+
+    def _task_details(self, query, _body, task_id) -> Response:
+        if task_id not in self.tasks:
+            return (
+                404,
+                {"ErrorMessage": "The resource you requested was not found."},
+                {},
+            )
+        task = self._advance_task(task_id)
+        log = task["_log"]
+        if "tail" in query:
+            log = log[-int(query["tail"]) :] if int(query["tail"]) else []
+        activity = {
+            "Id": f"{task_id}-deploy",
+            "Name": "Deploy",
+            "LogElements": log,
+            "Children": [],
+        }
+        return 200, {"Task": _public(task), "ActivityLogs": [activity]}, {}
+
+
+_ROUTES: List[Tuple[re.Pattern, str, Callable[..., Response]]] = [
+    (re.compile(pattern), method, handler)
+    for pattern, method, handler in [
+        (r"^api$", "HEAD", FakeOctopusServer._api),
+        (r"^api$", "GET", FakeOctopusServer._api),
+        (r"^api/environments/all$", "GET", FakeOctopusServer._all_environments),
+        (r"^api/tenants/all$", "GET", FakeOctopusServer._all_tenants),
+        (r"^api/tenants$", "GET", FakeOctopusServer._tenants),
+        (r"^api/projects/([^/]+)$", "GET", FakeOctopusServer._get_project),
+        (
+            r"^api/projects/([^/]+)/releases/([^/]+)$",
+            "GET",
+            FakeOctopusServer._get_release,
+        ),
+        (
+            r"^api/projects/([^/]+)/releases/([^/]+)$",
+            "HEAD",
+            FakeOctopusServer._get_release,
+        ),
+        (r"^api/projects/([^/]+)/progression$", "GET", FakeOctopusServer._progression),
+        (
+            r"^api/projects/([^/]+)/deploymentprocesses/template$",
+            "GET",
+            FakeOctopusServer._template,
+        ),
+        (r"^api/releases$", "POST", FakeOctopusServer._create_release),
+        (
+            r"^api/releases/([^/]+)/deployments/preview/([^/]+)$",
+            "GET",
+            FakeOctopusServer._preview,
+        ),
+        (r"^api/variables/variableset-([^/]+)$", "GET", FakeOctopusServer._variables),
+        (
+            r"^api/feeds/([^/]+)/packages/versions$",
+            "GET",
+            FakeOctopusServer._feed_versions,
+        ),
+        (r"^api/deployments$", "POST", FakeOctopusServer._create_deployment),
+        (r"^api/tasks/([^/]+)$", "GET", FakeOctopusServer._task),
+        (r"^api/tasks/([^/]+)/details$", "GET", FakeOctopusServer._task_details),
+        (r"^api/tasks/([^/]+)/cancel$", "POST", FakeOctopusServer._cancel_task),
+    ]
+]
+
+
+def _endpoint(method: str, path: str) -> str:
+    return f"{method} {path_template(path)}"
+
+
+def _public(resource: dict) -> dict:
+    return {k: v for k, v in resource.items() if not k.startswith("_")}
+
+
+def _version_key(version: str):
+    return tuple(int(p) if p.isdigit() else 0 for p in re.split(r"[.-]", version))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, avoid waiting for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self._dispatch("GET")
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self._dispatch("HEAD")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else None
+
+        status, payload, headers = self.server.fake.handle(  # type: ignore
+            method, self.path, body, self.headers
+        )
+        content = json.dumps(payload).encode("utf-8")
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'  # nosec
+        if (
+            status == 200
+            and method == "GET"
+            and self.headers.get("If-None-Match") == etag
+        ):
+            status, content = 304, b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(content)
+
+
+if __name__ == "__main__":
+    fake = FakeOctopusServer(tenants=[f"fc:tenant{i}" for i in range(30)]).start(8088)
+    print(f"Fake Octopus Deploy server listening on {fake.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
@@ -1,4 +1,5 @@
 import functools
+import threading
 from unittest.mock import patch
 
 from velo_action.octopus.client import OctopusClient
@@ -43,18 +44,21 @@ def mock_client_requests(registered_responses: list = None):
             else:
                 # Local copy to prevent side effects
                 responses = list(registered_responses)
+            # Requests may be sent from several threads
+            lock = threading.Lock()
 
             def perform_request(_self, method, path, data=None):
                 nonlocal responses
-                for i, req in enumerate(responses):
-                    if method != req.method or path != req.path:
-                        continue
+                with lock:
+                    for i, req in enumerate(responses):
+                        if method != req.method or path != req.path:
+                            continue
 
-                    if req.payload:
-                        assert data == req.payload
+                        if req.payload:
+                            assert data == req.payload
 
-                    responses.pop(i)
-                    return req.response
+                        responses.pop(i)
+                        return req.response
                 raise RuntimeError(
                     f"No request found for '{method}' '{path}'. "
                     f"Add it to @mock_client_requests([]):\n"
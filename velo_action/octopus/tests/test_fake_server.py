@@ -0,0 +1,197 @@
+from unittest.mock import patch
+
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment, DeploymentState
+from velo_action.octopus.release import Release
+from velo_action.octopus.retry import RetryPolicy
+from velo_action.octopus.tests.fake_server import FakeOctopusServer
+from velo_action.settings import VELO_TRACE_ID_NAME
+
+
+@pytest.fixture
+def server():
+    with FakeOctopusServer(tenants=["fc:osl1", "fc:rd1"]) as fake:
+        yield fake
+
+
+@pytest.fixture
+def octo(server):
+    return OctopusClient(server=server.url, api_key="API-KEY")
+
+
+def test_lookups(server, octo):
+    assert octo.lookup_environment_id("staging") == server.environments["staging"]
+    assert octo.lookup_tenant_id("fc:rd1") == server.tenants["fc:rd1"]
+    assert octo.lookup_project_id("ProjectName") == server.projects["ProjectName"]["Id"]
+    with pytest.raises(ValueError, match="'unknown' is unknown"):
+        octo.lookup_environment_id("unknown")
+
+
+@patch("velo_action.octopus.deployment.sleep")
+def test_release_and_deployments(_sleep, server, octo, default_github_settings):
+    release = Release(client=octo)
+    assert not Release.exists("ProjectName", "1.0.0", client=octo)
+    release.create(
+        project_name="ProjectName",
+        project_version="1.0.0",
+        github_settings=default_github_settings,
+    )
+    assert server.releases[release.id()]["SelectedPackages"] == [
+        {"ActionName": "deploy velo-bootstrapper", "Version": "1.0.0"}
+    ]
+
+    for tenant in ("fc:osl1", "fc:rd1"):
+        deployment = Deployment(
+            project_name="ProjectName", version="1.0.0", client=octo
+        )
+        deployment.create(
+            env_name="prod",
+            tenant=tenant,
+            wait_seconds=10,
+            variables={VELO_TRACE_ID_NAME: "trace"},
+        )
+
+    assert len(server.deployments) == 2
+    assert server.request_count("POST api/deployments") == 2
+    assert server.request_count("GET api/tasks/{id}") == 4
+    assert server.request_count("GET api/projects/{id}/progression") == 0
+
+
+def test_deployment_state_transitions(default_github_settings):
+    with FakeOctopusServer(failing_targets=[("dev", None)]) as server:
+        octo = OctopusClient(server=server.url, api_key="API-KEY")
+        Release(client=octo).create(
+            project_name="ProjectName",
+            project_version="1.0.0",
+            github_settings=default_github_settings,
+        )
+        env_id = server.environments["dev"]
+        deployment = Deployment(
+            project_name="ProjectName", version="1.0.0", client=octo
+        )
+        deployment.create(env_name="dev")
+
+        states = [deployment.get_state(env_id, None) for _ in range(3)]
+        assert states == [
+            DeploymentState.PROGRESS,
+            DeploymentState.FAIL,
+            DeploymentState.FAIL,
+        ]
+
+
+@patch("velo_action.octopus.client.time.sleep")
+def test_error_injection(_sleep, server):
+    octo = OctopusClient(
+        server=server.url, api_key="API-KEY", retry_policy=RetryPolicy(max_retries=1)
+    )
+    server.inject_error(
+        "GET api/environments/all", status=503, headers={"Retry-After": "1"}
+    )
+    assert octo.lookup_environment_id("dev") == server.environments["dev"]
+    assert octo.retry_counts() == {"503": 1}
+    assert server.request_count("GET api/environments/all") == 2
+
+
+def test_latency(server, octo):
+    server.latency["GET api/environments/all"] = 0.05
+    octo.lookup_environment_id("dev")
+    (stats,) = [
+        s for s in octo.latency.stats() if s.endpoint == "GET api/environments/all"
+    ]
+    assert stats.max >= 0.05
+
+
+def test_cancel_deployment(default_github_settings):
+    with FakeOctopusServer() as server:
+        octo = OctopusClient(server=server.url, api_key="API-KEY")
+        Release(client=octo).create(
+            project_name="ProjectName",
+            project_version="1.0.0",
+            github_settings=default_github_settings,
+        )
+        deployment = Deployment(
+            project_name="ProjectName", version="1.0.0", client=octo
+        )
+        deployment.create(env_name="dev")
+        deployment.cancel()
+
+        assert server.tasks[deployment.task_id()]["State"] == "Canceled"
+        assert deployment.get_task_state() == DeploymentState.FAIL
+
+
+def test_cancel_before_the_deployment_is_created(default_github_settings):
+    with FakeOctopusServer() as server:
+        octo = OctopusClient(server=server.url, api_key="API-KEY")
+        Release(client=octo).create(
+            project_name="ProjectName",
+            project_version="1.0.0",
+            github_settings=default_github_settings,
+        )
+        deployment = Deployment(
+            project_name="ProjectName", version="1.0.0", client=octo
+        )
+        deployment.cancel()
+        with pytest.raises(RuntimeError, match="cancelled before it was created"):
+            deployment.create(env_name="dev")
+
+        assert server.request_count("POST api/deployments") == 0
+        assert server.request_count("POST api/tasks/{id}/cancel") == 0
+
+
+def test_cancel_while_the_deployment_is_created(default_github_settings):
+    with FakeOctopusServer() as server:
+        octo = OctopusClient(server=server.url, api_key="API-KEY")
+        Release(client=octo).create(
+            project_name="ProjectName",
+            project_version="1.0.0",
+            github_settings=default_github_settings,
+        )
+        deployment = Deployment(
+            project_name="ProjectName", version="1.0.0", client=octo
+        )
+        post = octo.post
+
+        def cancel_during_post(path, data):
+            created = post(path, data)
+            if path == "api/deployments":
+                # Requested before the client returned the created deployment
+                deployment.cancel()
+            return created
+
+        with patch.object(octo, "post", side_effect=cancel_during_post):
+            deployment.create(env_name="dev")
+        deployment.cancel()
+
+        assert server.request_count("POST api/deployments") == 1
+        assert server.request_count("POST api/tasks/{id}/cancel") == 1
+        assert server.tasks[deployment.task_id()]["State"] == "Canceled"
+
+
+def test_create_or_get_release(server, octo, default_github_settings):
+    assert Release.find("1.0.0", client=octo, project_name="ProjectName") is None
+
+    payload = Release(client=octo).build_payload(
+        project_name="ProjectName",
+        project_version="1.0.0",
+        github_settings=default_github_settings,
+    )
+    created = Release(client=octo)
+    assert created.submit(payload) is True
+
+    # A concurrent run creating the same version gets the existing release
+    existing = Release(client=octo)
+    assert existing.submit(payload) is False
+    assert existing.id() == created.id()
+    assert existing.version() == "1.0.0"
+    assert server.request_count("POST api/releases") == 2
+    assert server.request_count("GET api/projects/{id}/releases/{id}") == 2
+
+    found = Release.find("1.0.0", client=octo, project_name="ProjectName")
+    assert found and found.id() == created.id()
+
+
+def test_find_release_of_unknown_project(octo):
+    with pytest.raises(RuntimeError, match="Not Found"):
+        Release.find("1.0.0", client=octo, project_name="Typo")
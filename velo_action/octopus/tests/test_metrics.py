@@ -0,0 +1,90 @@
+import unittest.mock
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.metrics import LatencyRecorder, path_template
+
+
+@pytest.mark.parametrize(
+    "path,template",
+    [
+        ("api/environments/all", "api/environments/all"),
+        ("api/projects/ProjectName", "api/projects/{id}"),
+        ("api/projects/Projects-1/releases/1.2.3", "api/projects/{id}/releases/{id}"),
+        (
+            "api/releases/Releases-1/deployments/preview/Environments-2",
+            "api/releases/{id}/deployments/preview/{id}",
+        ),
+        (
+            "api/feeds/feeds-builtin/packages/versions?packageId=velo&take=1",
+            "api/feeds/{id}/packages/versions",
+        ),
+    ],
+)
+def test_path_template(path, template):
+    assert path_template(path) == template
+
+
+def test_latency_stats():
+    recorder = LatencyRecorder()
+    for millis in range(1, 101):
+        recorder.record("GET api/environments/all", millis / 1000)
+    recorder.record("POST api/deployments", 0.5)
+
+    stats = recorder.stats()
+    assert [s.endpoint for s in stats] == [
+        "GET api/environments/all",
+        "POST api/deployments",
+    ]
+    assert stats[0].calls == 100
+    assert stats[0].p50 == 0.05
+    assert stats[0].p95 == 0.095
+    assert stats[0].max == 0.1
+
+    table = recorder.format_table().splitlines()
+    assert table[0].split() == [
+        "Endpoint",
+        "Calls",
+        "p50",
+        "(ms)",
+        "p95",
+        "(ms)",
+        "max",
+        "(ms)",
+    ]
+    assert table[1].split() == ["GET", "api/environments/all", "100", "50", "95", "100"]
+
+
+def test_requests_are_traced_and_recorded():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    parent = provider.get_tracer(__name__).start_span("build and deploy")
+
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/")
+    octo.set_trace_parent(parent)
+
+    with unittest.mock.patch(
+        "velo_action.octopus.client.trace.get_tracer", provider.get_tracer
+    ), unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.return_value = unittest.mock.Mock(
+            **{"status_code": 200, "content": b"[]", "request.method": "GET"}
+        )
+        request_mock.return_value.json.return_value = []
+        octo.get("api/projects/Projects-1/progression")
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "octopus GET api/projects/{id}/progression"
+    assert span.parent.span_id == parent.get_span_context().span_id
+    assert span.attributes["http.status_code"] == 200
+    assert span.attributes["http.response_content_length"] == 2
+    assert [s.endpoint for s in octo.latency.stats()] == [
+        "GET api/projects/{id}/progression"
+    ]
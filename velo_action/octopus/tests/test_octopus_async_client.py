@@ -0,0 +1,93 @@
+# pylint: disable=protected-access
+import asyncio
+
+import pytest
+
+from velo_action.octopus.async_client import AsyncOctopusClient
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.retry import RetryPolicy
+from velo_action.octopus.tests.test_decorators import Request, mock_client_requests
+
+
+@pytest.fixture
+@mock_client_requests(
+    [
+        Request("head", "api", response=True),
+    ]
+)
+def octo():
+    return AsyncOctopusClient(OctopusClient(server="https://octopus/"))
+
+
+@mock_client_requests(
+    [
+        Request("get", "some/path", response={"Text": "Yohoo"}),
+        Request("head", "some/path", response=True),
+        Request("post", "some/path", payload={"A": 1}, response={"Text": "Ok"}),
+    ]
+)
+def test_get_head_post(octo):
+    async def run():
+        return await asyncio.gather(
+            octo.get("some/path"),
+            octo.head("some/path"),
+            octo.post("some/path", data={"A": 1}),
+        )
+
+    assert asyncio.run(run()) == [{"Text": "Yohoo"}, True, {"Text": "Ok"}]
+    assert octo.base_url() == "https://octopus/"
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get", "api/environments/all", response=[{"Name": "DevEnv", "Id": "env-1"}]
+        ),
+        Request("get", "api/projects/ProjectName", response={"Id": "project-1"}),
+        Request(
+            "get",
+            "api/tenants?partialName=TenantName&skip=0&take=30",
+            response={
+                "Items": [{"Name": "TenantName", "Id": "tenant-1"}],
+                "TotalResults": 1,
+            },
+        ),
+    ]
+)
+def test_lookups(octo):
+    async def run():
+        return await asyncio.gather(
+            octo.lookup_environment_id("DevEnv"),
+            octo.lookup_project_id("ProjectName"),
+            octo.lookup_tenant_id("TenantName"),
+        )
+
+    assert asyncio.run(run()) == ["env-1", "project-1", "tenant-1"]
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get", "api/environments/all", response=[{"Name": "DevEnv", "Id": "env-1"}]
+        ),
+    ]
+)
+def test_lookup_unknown_environment_id(octo):
+    with pytest.raises(ValueError, match="'UnknownEnv' is unknown"):
+        asyncio.run(octo.lookup_environment_id("UnknownEnv"))
+
+
+@mock_client_requests(
+    [
+        Request("head", "api", response=True),
+    ]
+)
+def test_connect_configures_the_client(tmp_path):
+    policy = RetryPolicy(max_retries=1)
+    octo = asyncio.run(
+        AsyncOctopusClient.connect(
+            server="https://octopus/", cache_dir=tmp_path, retry_policy=policy
+        )
+    )
+    assert octo.client._retry_policy is policy
+    assert octo.client._disk_cache is not None
@@ -1,8 +1,13 @@
+# pylint: disable=protected-access
 import unittest.mock
 
 import pytest
 
-from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.client import (
+    DEFAULT_TIMEOUT,
+    FILTERED_LOOKUP_MAX_NAMES,
+    OctopusClient,
+)
 from velo_action.octopus.tests.test_decorators import Request, mock_client_requests
 
 
@@ -16,10 +21,10 @@ def octo():
     return OctopusClient()
 
 
-@unittest.mock.patch(target="requests.request")
+@unittest.mock.patch(target="requests.Session.request")
 def test_init(request_mock: unittest.mock.Mock):
     request_mock.return_value = unittest.mock.Mock(
-        **{"status_code": 200, "request.method": "head"}
+        **{"status_code": 200, "content": b"", "request.method": "head"}
     )
 
     OctopusClient(server="https://octopus/", api_key="ExampleApiKey")
@@ -29,9 +34,26 @@ def test_init(request_mock: unittest.mock.Mock):
         "https://octopus/api",
         headers={"X-Octopus-ApiKey": "ExampleApiKey"},
         json=None,
+        timeout=DEFAULT_TIMEOUT,
     )
 
 
+def test_session_is_pooled():
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/", pool_size=4)
+
+    adapter = octo._session.get_adapter("https://octopus/api")
+    assert adapter._pool_maxsize == 4
+    assert octo._session.headers["Connection"] == "keep-alive"
+
+
+def test_session_without_keep_alive():
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/", keep_alive=False)
+
+    assert octo._session.headers["Connection"] == "close"
+
+
 @mock_client_requests(
     [
         Request("get", "some/path", response={"Text": "Yohoo"}),
@@ -101,8 +123,11 @@ def test_lookup_unknown_project_id(octo):
     [
         Request(
             "get",
-            "api/tenants/all",
-            response=[{"Name": "TenantName", "Id": "tenant-1"}],
+            "api/tenants?partialName=TenantName&skip=0&take=30",
+            response={
+                "Items": [{"Name": "TenantName", "Id": "tenant-1"}],
+                "TotalResults": 1,
+            },
         ),
     ]
 )
@@ -116,8 +141,8 @@ def test_lookup_tenant_id(octo):
     [
         Request(
             "get",
-            "api/tenants/all",
-            response=[{"Name": "TenantName", "Id": "tenant-1"}],
+            "api/tenants?partialName=UnknownTenant&skip=0&take=30",
+            response={"Items": [], "TotalResults": 0},
         ),
     ]
 )
@@ -126,6 +151,237 @@ def test_lookup_unknown_tenant_id(octo):
         octo.lookup_tenant_id("UnknownTenant")
 
 
+@mock_client_requests(
+    [
+        Request(
+            "get",
+            "api/tenants?partialName=fc%3Ard1&skip=0&take=30",
+            response={
+                "Items": [
+                    {"Name": f"fc:rd1{i}", "Id": f"tenant-{i}"} for i in range(30)
+                ],
+                "TotalResults": 31,
+            },
+        ),
+        Request(
+            "get",
+            "api/tenants?partialName=fc%3Ard1&skip=30&take=30",
+            response={
+                "Items": [{"Name": "fc:rd1", "Id": "tenant-rd1"}],
+                "TotalResults": 31,
+            },
+        ),
+    ]
+)
+def test_filtered_tenant_lookup_pages_until_exact_match(octo):
+    assert octo.lookup_tenant_id("fc:rd1") == "tenant-rd1"
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get",
+            "api/tenants/all",
+            response=[{"Name": f"Tenant{i}", "Id": f"tenant-{i}"} for i in range(10)],
+        ),
+    ]
+)
+def test_many_tenants_are_looked_up_with_one_request(octo):
+    names = [f"Tenant{i}" for i in range(FILTERED_LOOKUP_MAX_NAMES + 1)]
+    assert octo.lookup_tenant_ids(names + ["Unknown"]) == {
+        name: f"tenant-{i}" for i, name in enumerate(names)
+    }
+    # Complete after downloading all tenants, unknown names need no request
+    with pytest.raises(ValueError, match="'Unknown' is unknown"):
+        octo.lookup_tenant_id("Unknown")
+
+
+def test_lookups_are_scoped_per_client(octo):
+    with unittest.mock.patch.object(
+        OctopusClient, "get", return_value=[{"Name": "DevEnv", "Id": "env-1"}]
+    ):
+        assert octo.lookup_environment_id("DevEnv") == "env-1"
+
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        other = OctopusClient(server="https://other-octopus/")
+    with unittest.mock.patch.object(
+        OctopusClient, "get", return_value=[{"Name": "DevEnv", "Id": "env-2"}]
+    ):
+        assert other.lookup_environment_id("DevEnv") == "env-2"
+    assert octo.lookup_environment_id("DevEnv") == "env-1"
+
+
+def test_invalidate_lookups(octo):
+    with unittest.mock.patch.object(
+        OctopusClient, "get", return_value={"Id": "project-1"}
+    ) as get:
+        assert octo.lookup_project_id("ProjectName") == "project-1"
+        octo.invalidate_lookups()
+        assert octo.lookup_project_id("ProjectName") == "project-1"
+    assert get.call_count == 2
+
+
 def test_lookup_tenant_id_without_name(octo):
     assert octo.lookup_tenant_id(None) == ""
     assert octo.lookup_tenant_id("") == ""
+
+
+@pytest.fixture
+@mock_client_requests(
+    [
+        Request("head", "api", response=True),
+    ]
+)
+def cached_octo(tmp_path):
+    return OctopusClient(server="https://octopus/", cache_dir=tmp_path)
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get", "api/environments/all", response=[{"Name": "DevEnv", "Id": "env-1"}]
+        ),
+        Request("get", "api/projects/ProjectName", response={"Id": "project-1"}),
+    ]
+)
+def test_lookups_are_cached_on_disk(tmp_path, cached_octo):
+    assert cached_octo.lookup_environment_id("DevEnv") == "env-1"
+    assert cached_octo.lookup_project_id("ProjectName") == "project-1"
+
+    # A new client for the same server reads the lookups from disk
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/", cache_dir=tmp_path)
+    assert octo.lookup_environment_id("DevEnv") == "env-1"
+    assert octo.lookup_project_id("ProjectName") == "project-1"
+
+
+def test_invalidate_lookups_on_disk(tmp_path, cached_octo):
+    with unittest.mock.patch.object(
+        OctopusClient, "get", return_value={"Id": "project-1"}
+    ) as get:
+        assert cached_octo.lookup_project_id("ProjectName") == "project-1"
+        cached_octo.invalidate_lookups()
+        assert cached_octo.lookup_project_id("ProjectName") == "project-1"
+
+        # A new client does not find the invalidated lookup on disk either
+        with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+            octo = OctopusClient(server="https://octopus/", cache_dir=tmp_path)
+        octo.invalidate_lookups()
+        assert octo.lookup_project_id("ProjectName") == "project-1"
+    assert get.call_count == 3
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get", "api/environments/all", response=[{"Name": "DevEnv", "Id": "env-1"}]
+        ),
+    ]
+)
+def test_disk_cache_is_scoped_by_server(tmp_path, cached_octo):
+    assert cached_octo.lookup_environment_id("DevEnv") == "env-1"
+
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://other-octopus/", cache_dir=tmp_path)
+    with unittest.mock.patch.object(
+        OctopusClient, "get", return_value=[{"Name": "DevEnv", "Id": "env-2"}]
+    ):
+        assert octo.lookup_environment_id("DevEnv") == "env-2"
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get", "api/tenants/all", response=[{"Name": "OldTenant", "Id": "tenant-1"}]
+        ),
+        Request(
+            "get",
+            "api/tenants?partialName=NewTenant&skip=0&take=30",
+            response={
+                "Items": [{"Name": "NewTenant", "Id": "tenant-2"}],
+                "TotalResults": 1,
+            },
+        ),
+        Request(
+            "get",
+            "api/tenants?partialName=UnknownTenant&skip=0&take=30",
+            response={"Items": [], "TotalResults": 0},
+        ),
+    ]
+)
+def test_names_missing_from_disk_cache_are_looked_up(tmp_path, cached_octo):
+    assert cached_octo.lookup_tenant_ids(
+        [f"Tenant{i}" for i in range(FILTERED_LOOKUP_MAX_NAMES)] + ["OldTenant"]
+    ) == {"OldTenant": "tenant-1"}
+
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/", cache_dir=tmp_path)
+    assert octo.lookup_tenant_id("NewTenant") == "tenant-2"
+    with pytest.raises(ValueError, match="'UnknownTenant' is unknown"):
+        octo.lookup_tenant_id("UnknownTenant")
+
+
+FEED_PATH = "api/feeds/feeds-builtin/packages/versions?packageId=velo&take=1"
+
+
+@mock_client_requests(
+    [
+        Request("get", FEED_PATH, response={"Items": [{"Version": "1.0.0"}]}),
+    ]
+)
+def test_feed_versions_are_shared_between_runs(tmp_path, cached_octo):
+    assert cached_octo.get_feed_versions(FEED_PATH)["Items"][0]["Version"] == "1.0.0"
+    cached_octo.get_feed_versions(FEED_PATH)["Items"].clear()
+    assert cached_octo.get_feed_versions(FEED_PATH)["Items"]
+
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/", cache_dir=tmp_path)
+    # Equal queries in another order share the entry
+    assert octo.get_feed_versions(
+        "api/feeds/feeds-builtin/packages/versions?take=1&packageId=velo"
+    ) == {"Items": [{"Version": "1.0.0"}]}
+
+
+SPACE_FEED_PATH = (
+    "api/Spaces-2/feeds/feeds-builtin/packages/versions?packageId=velo&take=1"
+)
+
+
+@mock_client_requests(
+    [
+        Request("get", FEED_PATH, response={"Items": [{"Version": "1.0.0"}]}),
+        Request("get", SPACE_FEED_PATH, response={"Items": [{"Version": "2.0.0"}]}),
+    ]
+)
+def test_feed_versions_are_cached_per_space(cached_octo):
+    assert cached_octo.get_feed_versions(FEED_PATH)["Items"][0]["Version"] == "1.0.0"
+    assert (
+        cached_octo.get_feed_versions(SPACE_FEED_PATH)["Items"][0]["Version"] == "2.0.0"
+    )
+
+
+def test_empty_feed_versions_are_not_cached(cached_octo):
+    with unittest.mock.patch.object(
+        OctopusClient,
+        "get",
+        side_effect=[{"Items": []}, {"Items": [{"Version": "1.0.0"}]}],
+    ) as get:
+        assert cached_octo.get_feed_versions(FEED_PATH) == {"Items": []}
+        assert cached_octo.get_feed_versions(FEED_PATH)["Items"]
+        assert cached_octo.get_feed_versions(FEED_PATH)["Items"]
+    assert get.call_count == 2
+
+
+@mock_client_requests(
+    [
+        Request("get", FEED_PATH, response={"Items": [{"Version": "1.0.0"}]}),
+        Request("get", FEED_PATH, response={"Items": [{"Version": "1.1.0"}]}),
+    ]
+)
+def test_feed_cache_can_be_disabled(tmp_path):
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(
+            server="https://octopus/", cache_dir=tmp_path, feed_cache_ttl=0
+        )
+    assert octo.get_feed_versions(FEED_PATH)["Items"][0]["Version"] == "1.0.0"
+    assert octo.get_feed_versions(FEED_PATH)["Items"][0]["Version"] == "1.1.0"
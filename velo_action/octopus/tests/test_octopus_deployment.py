@@ -1,3 +1,4 @@
+from datetime import timedelta
 from unittest.mock import Mock
 
 import pytest
@@ -206,45 +207,28 @@ def test_create_with_variables(monkeypatch, deployment1):
             },
             response={
                 "Id": "deployment-1",
+                "TaskId": "ServerTasks-1",
                 "Links": {"Web": "app#deployment-1"},
             },
         ),
         Request(
             "get",
-            "api/projects/project-1/progression",
+            "api/tasks/ServerTasks-1",
             response={
-                "Releases": [
-                    {
-                        "Release": {"Id": "release-1"},
-                        "Deployments": {
-                            "env-1": [
-                                {
-                                    "DeploymentId": "deployment-1",
-                                    "State": "Executing",
-                                }
-                            ]
-                        },
-                    }
-                ],
+                "Id": "ServerTasks-1",
+                "State": "Executing",
+                "IsCompleted": False,
+                "FinishedSuccessfully": False,
             },
         ),
         Request(
             "get",
-            "api/projects/project-1/progression",
+            "api/tasks/ServerTasks-1",
             response={
-                "Releases": [
-                    {
-                        "Release": {"Id": "release-1"},
-                        "Deployments": {
-                            "env-1": [
-                                {
-                                    "DeploymentId": "deployment-1",
-                                    "State": "Success",
-                                }
-                            ]
-                        },
-                    }
-                ],
+                "Id": "ServerTasks-1",
+                "State": "Success",
+                "IsCompleted": True,
+                "FinishedSuccessfully": True,
             },
         ),
     ]
@@ -254,3 +238,74 @@ def test_create_with_wait(monkeypatch, deployment1):
         client.OctopusClient, "lookup_environment_id", Mock(return_value="env-1")
     )
     deployment1.create("dev-env", wait_seconds=0.1)
+
+
+@mock_client_requests(
+    [
+        Request(
+            "post",
+            "api/deployments",
+            payload={
+                "EnvironmentId": "env-1",
+                "ProjectId": "project-1",
+                "ReleaseId": "release-1",
+            },
+            response={
+                "Id": "deployment-1",
+                "TaskId": "ServerTasks-1",
+                "Links": {"Web": "app#deployment-1"},
+            },
+        ),
+        Request(
+            "get",
+            "api/tasks/ServerTasks-1",
+            response={
+                "Id": "ServerTasks-1",
+                "State": "Failed",
+                "IsCompleted": True,
+                "FinishedSuccessfully": False,
+                "ErrorMessage": "Terraform apply failed",
+            },
+        ),
+    ]
+)
+def test_create_with_wait_fails_without_waiting_for_timeout(monkeypatch, deployment1):
+    monkeypatch.setattr(
+        client.OctopusClient, "lookup_environment_id", Mock(return_value="env-1")
+    )
+    sleep = Mock()
+    monkeypatch.setattr(deployment, "sleep", sleep)
+
+    with pytest.raises(RuntimeError, match="completed with error"):
+        deployment1.create("dev-env", wait_seconds=3600)
+    sleep.assert_not_called()
+
+
+def test_wait_backs_off_until_the_deadline(monkeypatch, deployment1):
+    # pylint: disable=protected-access
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(deployment, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(deployment, "sleep", sleep)
+    monkeypatch.setattr(
+        deployment.Deployment,
+        "get_task_state",
+        Mock(return_value=deployment.DeploymentState.PROGRESS),
+    )
+    deployment1._octo_object = {"TaskId": "ServerTasks-1"}
+
+    state = deployment1._wait_until_completed(
+        duration=timedelta(seconds=60),
+        environment_id="env-1",
+        tenant_id="",
+    )
+
+    assert state == deployment.DeploymentState.TIMEOUT
+    assert sleeps[:3] == [0.5, 0.75, 1.125]
+    assert max(sleeps) == deployment.POLL_INTERVAL_MAX
+    assert sum(sleeps) == 60
@@ -1,6 +1,9 @@
 # pylint: disable=protected-access
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from semantic_version import Version
+from semantic_version import SimpleSpec, Version
 
 from velo_action.octopus.client import OctopusClient
 from velo_action.octopus.release import (
@@ -10,6 +13,7 @@ from velo_action.octopus.release import (
 )
 from velo_action.octopus.tests.test_decorators import Request, mock_client_requests
 from velo_action.settings import VELO_TRACE_ID_NAME
+from velo_action.utils import find_matching_version
 
 
 @pytest.fixture
@@ -90,6 +94,28 @@ def test_form_variables(prepared_release):
     assert var_ids == {VELO_TRACE_ID_NAME: "abcdef0123456789"}
 
 
+def test_form_variables_of_environments_load_in_parallel(monkeypatch):
+    release = Release()
+    both_started = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def fetch(environment_id):
+        calls.append(environment_id)
+        # Times out if the downloads of the two environments are serialized
+        both_started.wait()
+        return {VELO_TRACE_ID_NAME: environment_id}
+
+    monkeypatch.setattr(release, "_fetch_preview_variable_ids", fetch)
+    environments = ["env-1", "env-2", "env-1", "env-2"]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        mappings = list(
+            pool.map(release.deployment_form_variable_mapping, environments)
+        )
+
+    assert [m[VELO_TRACE_ID_NAME] for m in mappings] == environments
+    assert sorted(calls) == ["env-1", "env-2"]
+
+
 @mock_client_requests(
     [
         Request(
@@ -118,6 +144,41 @@ def test_determine_latest_deploy_packages(prepared_release):
     ) == [{"ActionName": "FirstAction", "Version": "0.1.9"}]
 
 
+@mock_client_requests(
+    [
+        Request(
+            "get",
+            "api/projects/project-1/deploymentprocesses/template",
+            response={
+                "Packages": [
+                    {"FeedId": "feed-1", "PackageId": "package-1", "ActionName": "A"},
+                    {"FeedId": "feed-1", "PackageId": "package-2", "ActionName": "B"},
+                    {"FeedId": "feed-1", "PackageId": "package-1", "ActionName": "C"},
+                ]
+            },
+        ),
+        Request(
+            "get",
+            r"api/feeds/feed-1/packages/versions?packageId=package-1&preReleaseTag=^(|\+.*)$&take=1",
+            response={"Items": [{"Version": "0.1.9"}]},
+        ),
+        Request(
+            "get",
+            r"api/feeds/feed-1/packages/versions?packageId=package-2&preReleaseTag=^(|\+.*)$&take=1",
+            response={"Items": [{"Version": "2.0.0"}]},
+        ),
+    ]
+)
+def test_shared_packages_are_looked_up_once(prepared_release):
+    assert prepared_release._determine_latest_deploy_packages(
+        prepared_release.project_id()
+    ) == [
+        {"ActionName": "A", "Version": "0.1.9"},
+        {"ActionName": "B", "Version": "2.0.0"},
+        {"ActionName": "C", "Version": "0.1.9"},
+    ]
+
+
 @mock_client_requests(
     [
         Request("get", "api/projects/ProjectName", response={"Id": "project-1"}),
@@ -144,7 +205,7 @@ def test_exists(client):
             "get",
             (
                 "api/Spaces-1/feeds/feeds-builtin/packages/versions?"
-                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&take=1000&includePreRelease=false&includeReleaseNotes=false"
+                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&skip=0&take=100&includePreRelease=false&includeReleaseNotes=false"
             ),
             response={"Items": [{"Version": "0.1.9"}, {"Version": "1.0.0"}]},
         ),
@@ -157,8 +218,98 @@ def test_list_available_deploy_packages(client):
     assert len(versions) == 2
 
 
+@mock_client_requests(
+    [
+        Request(
+            "get",
+            (
+                "api/Spaces-1/feeds/feeds-builtin/packages/versions?"
+                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&skip={skip}&take=2&includePreRelease=false&includeReleaseNotes=false"
+            ),
+            response={"Items": items, "TotalResults": 5},
+        )
+        for skip, items in [
+            (0, [{"Version": "1.2.0"}, {"Version": "1.1.0"}]),
+            (2, [{"Version": "1.0.0"}, {"Version": "0.2.0"}]),
+        ]
+    ]
+)
+def test_iter_available_deploy_packages_pages_lazily(client):
+    versions = Release(client).iter_available_deploy_packages(page_size=2)
+    assert [next(versions) for _ in range(4)] == ["1.2.0", "1.1.0", "1.0.0", "0.2.0"]
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get",
+            (
+                "api/Spaces-1/feeds/feeds-builtin/packages/versions?"
+                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&skip={skip}&take=2&includePreRelease=false&includeReleaseNotes=false"
+            ),
+            response={"Items": items},
+        )
+        for skip, items in [
+            (0, [{"Version": "1.2.0"}, {"Version": "1.1.0"}]),
+            (2, [{"Version": "1.0.0"}]),
+        ]
+    ]
+)
+def test_iter_available_deploy_packages_without_total(client):
+    versions = Release(client).iter_available_deploy_packages(page_size=2)
+    assert list(versions) == ["1.2.0", "1.1.0", "1.0.0"]
+
+
 def test_create_octopus_package_payload_with_velo_version(prepared_release):
     """When a velo_version is spesified, use that version"""
     assert prepared_release._create_octopus_package_payload(
         package=VELO_BOOTSTRAPPER_ACTION_NAME, version=Version("0.1.9")
     ) == [{"ActionName": VELO_BOOTSTRAPPER_ACTION_NAME, "Version": "0.1.9"}]
+
+
+@mock_client_requests(
+    [
+        Request("get", "api/projects/ProjectName", response={"Id": "project-1"}),
+        Request(
+            "post",
+            "api/releases",
+            payload={"ProjectId": "project-1", "Version": "1.2.3", "ReleaseNotes": ""},
+            response={"Id": "release-1", "ProjectId": "project-1", "Version": "1.2.3"},
+        ),
+    ]
+)
+def test_build_payload_and_submit(client, default_github_settings, monkeypatch):
+    monkeypatch.setattr(
+        "velo_action.octopus.release.create_release_notes", lambda _github: ""
+    )
+    release = Release(client=client)
+    payload = release.build_payload(
+        project_name="ProjectName",
+        project_version="1.2.3",
+        github_settings=default_github_settings,
+        auto_select_packages=False,
+    )
+    assert release.id() == ""
+
+    release.submit(payload)
+    assert release.id() == "release-1"
+
+
+@mock_client_requests(
+    [
+        Request(
+            "get",
+            (
+                "api/Spaces-1/feeds/feeds-builtin/packages/versions?"
+                f"packageId={VELO_BOOTSTRAPPER_PACKAGE_ID}&skip=0&take=100&includePreRelease=false&includeReleaseNotes=false"
+            ),
+            response={"Items": [{"Version": "1.1.0"}, {"Version": "0.2.3"}]},
+        ),
+    ]
+)
+def test_version_index_is_downloaded_once(client):
+    rel = Release(client)
+    index = rel.version_index()
+    assert rel.version_index() is index
+    assert find_matching_version(index, SimpleSpec("1")) == Version("1.1.0")
+    assert find_matching_version(index, SimpleSpec("0.2")) == Version("0.2.3")
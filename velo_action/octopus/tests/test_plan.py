@@ -0,0 +1,100 @@
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment
+from velo_action.octopus.plan import (
+    count_requests,
+    form_variable_requests,
+    format_plan,
+    plan_targets,
+    raise_for_invalid_plan,
+)
+from velo_action.octopus.release import Release
+from velo_action.octopus.rollout import deployment_targets
+from velo_action.octopus.tests.fake_server import FakeOctopusServer
+from velo_action.settings import VELO_TRACE_ID_NAME
+
+
+@pytest.fixture
+def server():
+    with FakeOctopusServer(tenants=["fc:osl1", "fc:rd1"]) as fake:
+        yield fake
+
+
+@pytest.fixture
+def octo(server):
+    return OctopusClient(server=server.url, api_key="API-KEY")
+
+
+def test_plan_new_release(server, octo, default_github_settings):
+    release = Release(client=octo)
+    payload = release.plan(
+        project_name="ProjectName",
+        project_version="1.0.0",
+        github_settings=default_github_settings,
+    )
+    targets = deployment_targets(["dev", "prod"], ["fc:osl1", "fc:rd1"])
+    planned = plan_targets(
+        targets,
+        lambda: Deployment.from_release(release, client=octo),
+        variables={VELO_TRACE_ID_NAME: "trace"},
+    )
+
+    assert payload["SelectedPackages"] == [
+        {"ActionName": "deploy velo-bootstrapper", "Version": "1.0.0"}
+    ]
+    assert [p.payload["ReleaseId"] for p in planned] == ["", "", "", ""]
+    assert "FormValues" not in planned[0].payload
+    assert not server.releases and not server.deployments
+    assert server.request_count("POST api/releases") == 0
+    raise_for_invalid_plan(planned)
+
+
+def test_plan_reports_all_unknown_names(server, octo, default_github_settings):
+    Release(client=octo).create(
+        project_name="ProjectName",
+        project_version="1.0.0",
+        github_settings=default_github_settings,
+    )
+    release = Release.from_project_and_version(
+        version="1.0.0", client=octo, project_name="ProjectName"
+    )
+    server.reset_requests()
+
+    targets = deployment_targets(["dev", "qa"], ["fc:osl1", "fc:rd2"])
+    planned = plan_targets(
+        targets,
+        lambda: Deployment.from_release(release, client=octo),
+        variables={VELO_TRACE_ID_NAME: "trace"},
+    )
+
+    assert planned[0].payload == {
+        "EnvironmentId": server.environments["dev"],
+        "ProjectId": release.project_id(),
+        "ReleaseId": release.id(),
+        "TenantId": server.tenants["fc:osl1"],
+        "FormValues": {f"{release.id()}-{VELO_TRACE_ID_NAME}": "trace"},
+    }
+    assert [str(p.target) for p in planned if p.error] == [
+        "dev/fc:rd2",
+        "qa/fc:osl1",
+        "qa/fc:rd2",
+    ]
+    assert server.request_count("POST api/deployments") == 0
+    with pytest.raises(RuntimeError, match="3 of 4 planned deployments are invalid"):
+        raise_for_invalid_plan(planned)
+
+
+def test_format_plan(server, octo):
+    octo.lookup_environment_id("dev")
+    sent = count_requests(octo)
+    assert sent == server.request_count()
+
+    text = format_plan([], requests_sent=sent, requests_skipped=3)
+    assert f"The real run sends {sent + 3}" in text
+
+
+def test_form_variable_requests():
+    targets = deployment_targets(["staging", "prod"], ["fc:osl1", "fc:rd1"])
+    assert form_variable_requests(targets, from_snapshot=False) == 2
+    assert form_variable_requests(targets, from_snapshot=True) == 1
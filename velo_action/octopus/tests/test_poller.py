@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment, DeploymentState
+from velo_action.octopus.poller import ProgressionPoller
+from velo_action.octopus.release import Release
+from velo_action.octopus.rollout import deploy_targets, deployment_targets
+from velo_action.octopus.tests.fake_server import FakeOctopusServer
+
+TENANTS = ["fc:osl1", "fc:rd1", "fc:trd1", "fc:bgo1"]
+
+
+@pytest.fixture
+def server():
+    with FakeOctopusServer(
+        tenants=TENANTS, failing_targets=[("prod", "fc:rd1")]
+    ) as fake:
+        yield fake
+
+
+@pytest.fixture
+def octo(server, default_github_settings):
+    client = OctopusClient(server=server.url, api_key="API-KEY")
+    Release(client=client).create(
+        project_name="ProjectName",
+        project_version="1.0.0",
+        github_settings=default_github_settings,
+    )
+    return client
+
+
+def test_deployments_share_progression_requests(server, octo):
+    targets = deployment_targets(["prod"], TENANTS)
+    server.reset_requests()
+
+    results = deploy_targets(
+        targets,
+        lambda: Deployment(project_name="ProjectName", version="1.0.0", client=octo),
+        wait_seconds=10,
+        max_parallel=len(TENANTS),
+        poller=ProgressionPoller(octo, interval=0.01),
+    )
+
+    assert [str(r.target) for r in results if not r.succeeded] == ["prod/fc:rd1"]
+    assert "completed with error" in str(results[1].error)
+    # Waiting for one deployment takes a few progression requests, and the
+    # other deployments are tracked by the same requests
+    assert server.request_count("GET api/projects/{id}/progression") < 2 * len(TENANTS)
+
+
+@patch("velo_action.octopus.deployment.sleep")
+def test_deployments_streaming_logs_poll_their_task(_sleep, server, octo):
+    targets = deployment_targets(["prod"], TENANTS)
+    server.reset_requests()
+
+    results = deploy_targets(
+        targets,
+        lambda: Deployment.from_release(
+            Release.from_project_and_version("1.0.0", octo, project_name="ProjectName"),
+            client=octo,
+            log_tail=10,
+        ),
+        wait_seconds=10,
+        max_parallel=len(TENANTS),
+        poller=ProgressionPoller(octo, interval=0.01),
+    )
+
+    assert [str(r.target) for r in results if not r.succeeded] == ["prod/fc:rd1"]
+    assert server.request_count("GET api/projects/{id}/progression") == 0
+    assert server.request_count("GET api/tasks/{id}/details") >= len(TENANTS)
+
+
+def test_wait_times_out():
+    client = Mock(get=Mock(return_value={}))
+    deployment = Mock(
+        project_id=Mock(return_value="Projects-1"),
+        state_from_progression=Mock(return_value=DeploymentState.PROGRESS),
+    )
+    poller = ProgressionPoller(client, interval=0.01)
+
+    state = poller.wait(deployment, timedelta(seconds=0.05), "Environments-1", "")
+
+    assert state == DeploymentState.TIMEOUT
+    assert not poller._waiters["Projects-1"]  # pylint: disable=protected-access
+
+
+def test_request_errors_are_raised_in_waiting_threads():
+    client = Mock(get=Mock(side_effect=RuntimeError("Bad Gateway")))
+    deployment = Mock(project_id=Mock(return_value="Projects-1"))
+    poller = ProgressionPoller(client, interval=0.01)
+
+    with pytest.raises(RuntimeError, match="Bad Gateway"):
+        poller.wait(deployment, timedelta(seconds=1), "Environments-1", "")
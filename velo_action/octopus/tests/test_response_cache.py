@@ -0,0 +1,83 @@
+# pylint: disable=protected-access
+import unittest.mock
+
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.response_cache import ResponseCache
+
+
+def make_response(status_code, body=b"", headers=None):
+    response = unittest.mock.Mock(
+        **{
+            "status_code": status_code,
+            "content": body,
+            "headers": headers or {},
+            "request.method": "GET",
+        }
+    )
+    response.json.return_value = {"Items": [1, 2, 3]}
+    return response
+
+
+@pytest.fixture(params=["memory", "disk"])
+def response_cache(request, tmp_path):
+    return ResponseCache.from_mode(
+        request.param, maxsize=2, directory=tmp_path, namespace="https://octopus/"
+    )
+
+
+@pytest.fixture
+def octo(response_cache):
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        return OctopusClient(server="https://octopus/", response_cache=response_cache)
+
+
+def test_not_modified_is_served_from_cache(octo):
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.side_effect = [
+            make_response(200, b"{}", {"ETag": 'W/"abc"'}),
+            make_response(304),
+        ]
+        first = octo.get("api/feeds")
+        second = octo.get("api/feeds")
+
+    assert first == second == {"Items": [1, 2, 3]}
+    assert "If-None-Match" not in request_mock.call_args_list[0].kwargs["headers"]
+    assert request_mock.call_args_list[1].kwargs["headers"]["If-None-Match"] == (
+        'W/"abc"'
+    )
+
+
+def test_cached_response_is_copied(octo):
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.side_effect = [
+            make_response(200, b"{}", {"ETag": '"abc"'}),
+            make_response(304),
+        ]
+        octo.get("api/feeds")["Items"].append(4)
+        assert octo.get("api/feeds") == {"Items": [1, 2, 3]}
+
+
+def test_responses_without_validators_are_not_cached(response_cache):
+    response_cache.store("https://octopus/api", {}, {"Id": 1})
+    assert response_cache.lookup("https://octopus/api") is None
+
+
+def test_least_recently_used_response_is_evicted(response_cache):
+    for url in ("a", "b"):
+        response_cache.store(url, {"Last-Modified": "yesterday"}, {"Url": url})
+    assert response_cache.lookup("a").parsed() == {"Url": "a"}
+    response_cache.store("c", {"Last-Modified": "yesterday"}, {"Url": "c"})
+
+    assert response_cache.lookup("a") is not None
+    assert response_cache.lookup("b") is None
+    assert response_cache.lookup("c").conditional_headers() == {
+        "If-Modified-Since": "yesterday"
+    }
+
+
+def test_disk_mode_requires_directory():
+    assert ResponseCache.from_mode("none", maxsize=1) is None
+    with pytest.raises(ValueError):
+        ResponseCache.from_mode("disk", maxsize=1)
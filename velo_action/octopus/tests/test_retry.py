@@ -0,0 +1,101 @@
+import unittest.mock
+
+import pytest
+import requests
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.retry import RetryPolicy, parse_retry_after
+from velo_action.octopus.tests.fake_server import FakeOctopusServer
+
+
+def make_response(status_code, headers=None):
+    return unittest.mock.Mock(
+        **{
+            "status_code": status_code,
+            "content": b"",
+            "headers": headers or {},
+            "request.method": "GET",
+        }
+    )
+
+
+@pytest.fixture
+def octo():
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        return OctopusClient(
+            server="https://octopus/",
+            retry_policy=RetryPolicy(max_retries=2, max_total_seconds=10),
+        )
+
+
+@unittest.mock.patch("velo_action.octopus.client.time.sleep")
+def test_retry_transient_errors(sleep, octo):
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.side_effect = [
+            make_response(503, {"Retry-After": "2"}),
+            requests.ConnectionError("reset"),
+            make_response(200),
+        ]
+        assert octo.get("api/environments/all") is True
+
+    assert request_mock.call_count == 3
+    assert sleep.call_args_list[0].args == (2.0,)
+    assert octo.retry_counts() == {"503": 1, "ConnectionError": 1}
+
+
+@unittest.mock.patch("velo_action.octopus.client.time.sleep")
+def test_retries_are_limited(sleep, octo):
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.return_value = make_response(429)
+        assert octo.get("api/environments/all") is False
+
+    assert request_mock.call_count == 3
+
+
+@unittest.mock.patch("velo_action.octopus.client.time.sleep")
+def test_retry_after_beyond_deadline_is_not_awaited(sleep, octo):
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.return_value = make_response(503, {"Retry-After": "60"})
+        octo.get("api/environments/all")
+
+    assert request_mock.call_count == 1
+    sleep.assert_not_called()
+
+
+@unittest.mock.patch("velo_action.octopus.client.time.sleep")
+def test_post_is_not_retried(sleep, octo):
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.side_effect = requests.ConnectionError("reset")
+        with pytest.raises(RuntimeError, match="Error connecting"):
+            octo.post("api/deployments", data={})
+
+    assert request_mock.call_count == 1
+    assert octo.retry_counts() == {}
+
+
+def test_slow_responses_time_out_and_are_retried():
+    with FakeOctopusServer(latency={"GET api/environments/all": 0.5}) as server:
+        octo = OctopusClient(
+            server=server.url,
+            retry_policy=RetryPolicy(max_retries=1, backoff_factor=0),
+            timeout=(1.0, 0.1),
+        )
+        with pytest.raises(RuntimeError, match="timed out"):
+            octo.get("api/environments/all")
+
+    assert server.request_count("GET api/environments/all") == 2
+    assert octo.retry_counts() == {"ReadTimeout": 1}
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+    assert 0 <= policy.delay(1) <= 1
+    assert all(0 <= policy.delay(10) <= 5 for _ in range(100))
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [("3", 3.0), ("-1", 0.0), ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0), ("x", None)],
+)
+def test_parse_retry_after(header, expected):
+    assert parse_retry_after(make_response(503, {"Retry-After": header})) == expected
@@ -0,0 +1,226 @@
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment
+from velo_action.octopus.release import Release
+from velo_action.octopus.rollout import (
+    DeploymentTarget,
+    Wave,
+    deploy_targets,
+    deploy_waves,
+    deployment_targets,
+    parse_rollout_plan,
+    raise_for_failures,
+)
+from velo_action.octopus.tests.fake_server import FakeOctopusServer
+from velo_action.settings import VELO_TRACE_ID_NAME
+
+TENANTS = ["fc:osl1", "fc:rd1", "fc:trd1"]
+
+
+@pytest.fixture
+def server():
+    with FakeOctopusServer(
+        tenants=TENANTS, failing_targets=[("prod", "fc:rd1")]
+    ) as fake:
+        yield fake
+
+
+@pytest.fixture
+def octo(server, default_github_settings):
+    client = OctopusClient(server=server.url, api_key="API-KEY")
+    Release(client=client).create(
+        project_name="ProjectName",
+        project_version="1.0.0",
+        github_settings=default_github_settings,
+    )
+    return client
+
+
+def test_deployment_targets():
+    assert deployment_targets(["dev", "prod"], []) == [
+        DeploymentTarget("dev"),
+        DeploymentTarget("prod"),
+    ]
+    assert [str(t) for t in deployment_targets(["prod"], ["a", "b"])] == [
+        "prod/a",
+        "prod/b",
+    ]
+
+
+def test_parse_rollout_plan():
+    assert parse_rollout_plan(
+        "dev -> staging -> prod[tenants in parallel, max 5]", max_parallel=2
+    ) == [Wave(("dev",), 2), Wave(("staging",), 2), Wave(("prod",), 5)]
+    assert parse_rollout_plan("dev, test [parallel] -> prod[ Sequential ]") == [
+        Wave(("dev", "test"), None),
+        Wave(("prod",), 1),
+    ]
+
+
+@pytest.mark.parametrize(
+    "plan", ["dev -> -> prod", "dev[max 0]", "dev[fast]", "dev[max 2] prod"]
+)
+def test_parse_invalid_rollout_plan(plan):
+    with pytest.raises(ValueError):
+        parse_rollout_plan(plan)
+
+
+@patch("velo_action.octopus.deployment.sleep")
+def test_waves_stop_after_failing_wave(_sleep, server, octo):
+    waves = parse_rollout_plan("dev -> prod[parallel] -> prod2")
+    results = deploy_waves(
+        waves,
+        TENANTS,
+        lambda: Deployment(project_name="ProjectName", version="1.0.0", client=octo),
+        wait_seconds=0.5,
+    )
+
+    assert [r.wave for r in results] == waves[:2]
+    assert results[0].succeeded
+    assert [r.succeeded for r in results[0].results] == [True, True, True]
+    # All targets of the failing wave are deployed, but the next wave is not
+    assert [str(r.target) for r in results[1].results if not r.succeeded] == [
+        "prod/fc:rd1"
+    ]
+    assert len(server.deployments) == 6
+    assert "1 failed" in str(results[1])
+
+
+@patch("velo_action.octopus.deployment.sleep")
+def test_parallel_deployments_report_all_failures(_sleep, server, octo):
+    targets = deployment_targets(["staging", "prod"], TENANTS)
+    results = deploy_targets(
+        targets,
+        lambda: Deployment(project_name="ProjectName", version="1.0.0", client=octo),
+        wait_seconds=0.5,
+        max_parallel=4,
+    )
+
+    assert [r.target for r in results] == targets
+    assert [str(r.target) for r in results if not r.succeeded] == ["prod/fc:rd1"]
+    assert len(server.deployments) == 6
+
+    with pytest.raises(RuntimeError, match="1 of 6 deployments failed: 'prod/fc:rd1'"):
+        raise_for_failures(targets, results)
+
+
+@patch("velo_action.octopus.deployment.sleep")
+def test_sequential_deployments_stop_at_first_failure(_sleep, server, octo):
+    targets = deployment_targets(["prod"], TENANTS)
+    results = deploy_targets(
+        targets,
+        lambda: Deployment(project_name="ProjectName", version="1.0.0", client=octo),
+        wait_seconds=0.5,
+    )
+
+    assert [r.succeeded for r in results] == [True, False]
+    assert len(server.deployments) == 2
+    with pytest.raises(RuntimeError, match="Not deployed: prod/fc:trd1"):
+        raise_for_failures(targets, results)
+
+
+def test_release_is_fetched_once(server, octo):
+    release = Release.from_project_and_version(
+        version="1.0.0", client=octo, project_name="ProjectName"
+    )
+    deploy_targets(
+        deployment_targets(["dev", "staging", "prod"], ["fc:osl1"]),
+        lambda: Deployment.from_release(release, client=octo),
+    )
+
+    assert len(server.deployments) == 3
+    assert server.request_count("GET api/projects/{id}/releases/{id}") == 1
+
+
+@pytest.mark.parametrize(
+    "from_snapshot, endpoint",
+    [
+        (False, "GET api/releases/{id}/deployments/preview/{id}"),
+        (True, "GET api/variables/{id}"),
+    ],
+)
+def test_form_variables_are_looked_up_once_per_environment(
+    server, octo, from_snapshot, endpoint
+):
+    release = Release.from_project_and_version(
+        version="1.0.0", client=octo, project_name="ProjectName"
+    )
+    deploy_targets(
+        deployment_targets(["prod"], TENANTS),
+        lambda: Deployment.from_release(
+            release, client=octo, form_variables_from_snapshot=from_snapshot
+        ),
+        variables={VELO_TRACE_ID_NAME: "trace"},
+        max_parallel=3,
+    )
+
+    assert server.request_count(endpoint) == 1
+    for deployment in server.deployments.values():
+        assert deployment["FormValues"] == {
+            f"{release.id()}-{VELO_TRACE_ID_NAME}": "trace"
+        }
+
+
+class BlockingDeployment:
+    """Fails for 'fc:rd1', succeeds for 'fc:bgo1' and otherwise waits for cancel"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def create(self, env_name, tenant, **_kwargs):
+        if tenant == "fc:rd1":
+            raise RuntimeError(f"Deployment to {env_name} completed with error")
+        if tenant == "fc:bgo1":
+            return
+        if self.cancelled.wait(timeout=5):
+            raise RuntimeError("Deployment completed with error")
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def test_fail_fast_cancels_running_deployments():
+    targets = deployment_targets(["prod"], ["fc:bgo1", "fc:osl1", "fc:rd1"])
+    results = deploy_targets(
+        targets, BlockingDeployment, max_parallel=3, fail_fast=True
+    )
+
+    assert [(r.succeeded, r.cancelled) for r in results] == [
+        (True, False),
+        (False, True),
+        (False, False),
+    ]
+    assert str(results[1]).startswith("'prod/fc:osl1' cancelled after")
+    with pytest.raises(
+        RuntimeError,
+        match="1 of 3 deployments failed: 'prod/fc:rd1' .*. Cancelled: prod/fc:osl1$",
+    ):
+        raise_for_failures(targets, results)
+
+
+def test_fail_fast_skips_deployments_not_started():
+    targets = deployment_targets(["prod"], ["fc:osl1", "fc:rd1", "fc:trd1", "fc:a"])
+    results = deploy_targets(
+        targets, BlockingDeployment, max_parallel=2, fail_fast=True
+    )
+
+    assert [str(r.target) for r in results] == ["prod/fc:osl1", "prod/fc:rd1"]
+    with pytest.raises(RuntimeError, match="Not deployed: prod/fc:trd1, prod/fc:a"):
+        raise_for_failures(targets, results)
+
+
+def test_factory_errors_are_reported():
+    targets = deployment_targets(["dev"], [])
+    results = deploy_targets(
+        targets, Mock(side_effect=ValueError("Environment 'dev' is unknown"))
+    )
+    assert results[0].deployment is None
+    assert isinstance(results[0].error, ValueError)
+
+
+def test_no_failures():
+    raise_for_failures([DeploymentTarget("dev")], [])
@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"Releases": []}
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flight.do, "progression", fetch) for _ in range(5)]
+        time.sleep(0.05)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert results == [{"Releases": []}] * 5
+    # Every caller receives its own copy
+    assert len({id(r) for r in results}) == 5
+
+
+def test_result_without_followers_is_not_copied():
+    flight = SingleFlight()
+    result = {"Releases": []}
+    assert flight.do("progression", lambda: result) is result
+
+
+def test_leader_does_not_share_the_result_with_followers():
+    flight = SingleFlight()
+    result = {"Releases": []}
+    started, release = threading.Event(), threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(timeout=5)
+        return result
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "progression", fetch)
+        started.wait(timeout=5)
+        follower = pool.submit(flight.do, "progression", fetch)
+        time.sleep(0.05)
+        release.set()
+        assert leader.result() is not result
+        assert follower.result() is not result
+    assert leader.result() == follower.result() == result
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(timeout=5)
+        raise RuntimeError("Service Unavailable")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", fail)
+        started.wait(timeout=5)
+        follower = pool.submit(flight.do, "key", fail)
+        time.sleep(0.05)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="Service Unavailable"):
+                future.result()
+
+
+def test_completed_calls_are_not_reused():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+
+
+def test_client_coalesces_gets():
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/")
+
+    def slow_request(_self, method, path, data=None):
+        time.sleep(0.1)
+        return {"Path": path}
+
+    with unittest.mock.patch.object(
+        OctopusClient, "_request", autospec=True, side_effect=slow_request
+    ) as request_mock, ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(octo.get, ["api/environments/all"] * 4))
+
+    assert request_mock.call_count == 1
+    assert results == [{"Path": "api/environments/all"}] * 4
+
+
+def test_client_does_not_join_reads_sent_before_a_write():
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/")
+    started, release = threading.Event(), threading.Event()
+
+    def request(_self, method, path, data=None):
+        if method == "get" and not started.is_set():
+            started.set()
+            release.wait(timeout=5)
+        return {"Method": method}
+
+    with unittest.mock.patch.object(
+        OctopusClient, "_request", autospec=True, side_effect=request
+    ) as request_mock, ThreadPoolExecutor(max_workers=2) as pool:
+        stale = pool.submit(octo.get, "api/projects/Projects-1/progression")
+        started.wait(timeout=5)
+        octo.post("api/deployments", data={})
+        fresh = pool.submit(octo.get, "api/projects/Projects-1/progression")
+        assert fresh.result(timeout=5) == {"Method": "get"}
+        release.set()
+        stale.result(timeout=5)
+
+    assert request_mock.call_count == 3
@@ -0,0 +1,112 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from loguru import logger
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.deployment import Deployment
+from velo_action.octopus.release import Release
+from velo_action.octopus.task_log import TaskLogStream
+from velo_action.octopus.tests.fake_server import FakeOctopusServer
+
+
+def element(second, text, category="Info"):
+    return {
+        "Category": category,
+        "MessageText": text,
+        "OccurredAt": f"2023-01-01T00:00:{second:02d}Z",
+    }
+
+
+def details(*elements, children=()):
+    return {
+        "Task": {"Id": "ServerTasks-1", "IsCompleted": False},
+        "ActivityLogs": [
+            {
+                "Id": "step-1",
+                "Name": "Step 1",
+                "LogElements": list(elements),
+                "Children": list(children),
+            }
+        ],
+    }
+
+
+def test_only_new_lines_are_written():
+    client = Mock(
+        get=Mock(
+            side_effect=[
+                details(element(1, "a"), element(2, "b")),
+                details(element(2, "b"), element(3, "c", "Error")),
+                details(element(2, "b"), element(3, "c", "Error")),
+            ]
+        )
+    )
+    emit = Mock()
+    stream = TaskLogStream(client, "ServerTasks-1", tail=2, emit=emit)
+
+    for _ in range(3):
+        assert stream.poll()["Id"] == "ServerTasks-1"
+
+    assert [c.args for c in emit.call_args_list] == [
+        ("[Step 1] a", "Info"),
+        ("[Step 1] b", "Info"),
+        ("[Step 1] c", "Error"),
+    ]
+    client.get.assert_called_with(
+        "api/tasks/ServerTasks-1/details?verbose=false&tail=2"
+    )
+
+
+def test_skipped_lines_are_marked():
+    child = {
+        "Id": "step-2",
+        "Name": "Step 2",
+        "LogElements": [element(5, "child")],
+    }
+    client = Mock(
+        get=Mock(
+            side_effect=[
+                details(element(1, "a")),
+                details(element(3, "c"), element(4, "d"), children=[child]),
+            ]
+        )
+    )
+    emit = Mock()
+    stream = TaskLogStream(client, "ServerTasks-1", tail=2, emit=emit)
+
+    stream.poll()
+    stream.poll()
+
+    assert [c.args[0] for c in emit.call_args_list] == [
+        "[Step 1] a",
+        "[Step 1] ...",
+        "[Step 1] c",
+        "[Step 1] d",
+        "[Step 2] child",
+    ]
+
+
+@patch("velo_action.octopus.deployment.sleep")
+def test_deployment_streams_its_log(_sleep, default_github_settings):
+    with FakeOctopusServer(failing_targets=[("dev", None)]) as server:
+        octo = OctopusClient(server=server.url, api_key="API-KEY")
+        Release(client=octo).create(
+            project_name="ProjectName",
+            project_version="1.0.0",
+            github_settings=default_github_settings,
+        )
+        deployment = Deployment(
+            project_name="ProjectName", version="1.0.0", client=octo, log_tail=10
+        )
+        lines = []
+        sink = logger.add(lambda m: lines.append(m.strip()), format="{level} {message}")
+        try:
+            with pytest.raises(RuntimeError, match="completed with error"):
+                deployment.create(env_name="dev", wait_seconds=10)
+        finally:
+            logger.remove(sink)
+
+        assert "INFO [Deploy] Task state changed to Executing" in lines
+        assert "ERROR [Deploy] Task state changed to Failed" in lines
+        assert server.request_count("GET api/tasks/{id}") == 0
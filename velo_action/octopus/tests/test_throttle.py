@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from velo_action.octopus.client import OctopusClient
+from velo_action.octopus.throttle import Throttle, TokenBucket
+
+
+@unittest.mock.patch("velo_action.octopus.throttle.time.sleep")
+@unittest.mock.patch("velo_action.octopus.throttle.time.monotonic", return_value=100)
+def test_token_bucket_allows_burst_then_waits(monotonic, sleep):
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0.5
+    assert bucket.acquire() == 1.0
+
+    monotonic.return_value = 102
+    assert bucket.acquire() == 0
+    assert sleep.call_count == 2
+
+
+def test_token_bucket_requires_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_max_in_flight():
+    throttle = Throttle(max_in_flight=2)
+    lock = threading.Lock()
+    in_flight, peak = 0, 0
+
+    def request(_):
+        nonlocal in_flight, peak
+        with throttle.slot():
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(request, range(16)))
+
+    assert peak == 2
+
+
+def test_client_requests_are_throttled():
+    throttle = unittest.mock.MagicMock()
+    with unittest.mock.patch.object(OctopusClient, "_verify_connection"):
+        octo = OctopusClient(server="https://octopus/", throttle=throttle)
+
+    with unittest.mock.patch("requests.Session.request") as request_mock:
+        request_mock.return_value = unittest.mock.Mock(
+            **{"status_code": 200, "content": b"", "request.method": "GET"}
+        )
+        octo.get("api")
+
+    throttle.slot.assert_called_once()
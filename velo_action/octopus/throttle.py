@@ -0,0 +1,71 @@
+import contextlib
+import threading
+import time
+from typing import Iterator, Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` acquisitions per second
+
+    Up to `burst` tokens can be accumulated while idle, so short bursts are
+    let through at once while the long term rate stays bounded.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("The rate must be positive")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting until one is available. Returns the wait time"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Tokens are reserved up front, so concurrent callers queue up
+            # behind each other instead of all waking up at the same time
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class Throttle:
+    """
+    Limits the rate and the concurrency of requests to a server
+
+    A limit of None, or 0, disables it.
+    """
+
+    def __init__(
+        self,
+        max_requests_per_second: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        self._bucket = (
+            TokenBucket(max_requests_per_second) if max_requests_per_second else None
+        )
+        self._in_flight = (
+            threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        )
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Wait until a request may be sent, and hold on to the slot meanwhile"""
+        if self._in_flight:
+            self._in_flight.acquire()
+        try:
+            if self._bucket:
+                self._bucket.acquire()
+            yield
+        finally:
+            if self._in_flight:
+                self._in_flight.release()
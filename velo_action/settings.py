@@ -1,6 +1,6 @@
 # pylint: disable=no-self-argument,too-few-public-methods
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Literal, Optional, Union
 
 from loguru import logger
 from pydantic import BaseModel, BaseSettings, Field, ValidationError, validator
@@ -96,8 +96,12 @@ class ActionInputs(BaseSettings):
     deploy_to_environments: Union[
         str, List[str]
     ] = []  # see https://github.com/samuelcolvin/pydantic/issues/1458
+    # Waves of environments, like 'dev -> staging -> prod[parallel, max 5]'
+    rollout_plan: Optional[str] = None
 
     create_release: bool = False
+    # Resolve and print the release and deployments without creating them
+    plan: bool = False
     version: Optional[str] = None
     log_level: str = "INFO"
 
@@ -114,7 +118,32 @@ class ActionInputs(BaseSettings):
 
     velo_artifact_bucket_secret: Optional[str] = "velo_action_artifacts_bucket_name"
 
+    # Directory persisting Octopus name to id lookups between runs
+    octopus_cache_dir: Optional[str] = None
+    octopus_cache_ttl_seconds: int = 24 * 60 * 60
+    # Seconds feed package versions are reused, also between runs. 0 disables it.
+    octopus_feed_cache_ttl_seconds: int = 5 * 60
+    # Conditional GET cache of Octopus responses
+    octopus_response_cache: Literal["none", "memory", "disk"] = "memory"
+    octopus_response_cache_size: int = 256
+    # Retries of idempotent Octopus requests failing with a transient error
+    octopus_max_retries: int = 3
+    octopus_retry_max_seconds: int = 120
+    # Seconds to wait for a connection and for a response of Octopus
+    octopus_connect_timeout_seconds: float = 10
+    octopus_read_timeout_seconds: float = 60
+    # Client side limits of the Octopus traffic. 0 disables the limit.
+    octopus_max_requests_per_second: float = 0
+    octopus_max_in_flight: int = 0
+    # Where the ids of deployment form variables are looked up
+    octopus_form_variables_source: Literal["preview", "snapshot"] = "preview"
+
     wait_for_success_seconds: int = 0
+    # Recent task log lines fetched per poll while waiting. 0 disables it.
+    deployment_log_lines: int = 100
+    max_parallel_deployments: int = 1
+    # Cancel the running deployments when one of them fails
+    fail_fast: bool = False
     wait_for_deployment: bool = False
 
     # Variables making debugging easier
@@ -129,7 +158,7 @@ class ActionInputs(BaseSettings):
         if value is True:
             return True
 
-        if values["deploy_to_environments"]:
+        if values["deploy_to_environments"] or values.get("rollout_plan"):
             return True
         return False
 
@@ -158,6 +187,8 @@ class ActionInputs(BaseSettings):
         "octopus_api_key_secret",
         "velo_artifact_bucket_secret",
         "workspace",
+        "octopus_cache_dir",
+        "rollout_plan",
         pre=True,
     )
     def normalize_str(cls, value):
@@ -166,6 +197,28 @@ class ActionInputs(BaseSettings):
             return None
         return value
 
+    @validator("rollout_plan")
+    def validate_rollout_plan(cls, value, values):
+        if value and values.get("deploy_to_environments"):
+            raise ValueError(
+                "Only one of 'rollout_plan' and 'deploy_to_environments' can be set"
+            )
+        return value
+
+    @validator("octopus_response_cache")
+    def validate_response_cache(cls, value, values):
+        if value == "disk" and not values.get("octopus_cache_dir"):
+            raise ValueError(
+                "'octopus_cache_dir' must be set to cache responses on disk"
+            )
+        return value
+
+    @validator("max_parallel_deployments")
+    def validate_max_parallel_deployments(cls, value):
+        if value < 1:
+            raise ValueError("Must be at least 1")
+        return value
+
     @validator("log_level")
     def validate_log_level(cls, value):
         name = logger.level(value)
@@ -114,6 +114,22 @@ def test_parse_2item_list(monkeypatch):
     assert sett.deploy_to_environments == ["Some", "More"]
 
 
+def test_rollout_plan_creates_release(monkeypatch):
+    fill_default_action_envvars(monkeypatch)
+    monkeypatch.setenv("INPUT_ROLLOUT_PLAN", "dev -> prod[parallel]")
+    sett = ActionInputs()
+    assert sett.rollout_plan == "dev -> prod[parallel]"
+    assert sett.create_release is True
+
+
+def test_rollout_plan_excludes_deploy_to_environments(monkeypatch):
+    fill_default_action_envvars(monkeypatch)
+    monkeypatch.setenv("INPUT_ROLLOUT_PLAN", "dev -> prod")
+    monkeypatch.setenv("INPUT_DEPLOY_TO_ENVIRONMENTS", "dev,prod")
+    with pytest.raises(ValidationError, match="Only one of 'rollout_plan'"):
+        ActionInputs()
+
+
 def test_fail_on_unknown_log_level():
     with pytest.raises(ValidationError):
         ActionInputs(log_level="INVALID_LOG_LEVEL")
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+from velo_action.cache import DiskCache, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expires():
+    cache = TTLCache(ttl=60)
+    with patch("velo_action.cache.time.monotonic", return_value=1000):
+        cache.set("a", 1)
+    with patch("velo_action.cache.time.monotonic", return_value=1060):
+        assert cache.get("a") == 1
+    with patch("velo_action.cache.time.monotonic", return_value=1061):
+        assert cache.get("a", "expired") == "expired"
+
+
+def test_ttl_cache_get_or_set():
+    cache = TTLCache()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_set("a", factory) == "value"
+    assert cache.get_or_set("a", factory) == "value"
+    assert len(calls) == 1
+
+
+def test_ttl_cache_invalidate():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    assert "a" not in cache and "b" in cache
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_disk_cache_roundtrip(tmp_path):
+    cache = DiskCache(tmp_path, namespace="https://octopus/", ttl=60)
+    assert cache.get("environments") is None
+
+    cache.set("environments", {"DevEnv": "env-1"})
+    assert cache.get("environments") == {"DevEnv": "env-1"}
+
+    cache.delete("environments")
+    assert cache.get("environments") is None
+
+
+def test_disk_cache_expires(tmp_path):
+    cache = DiskCache(tmp_path, namespace="https://octopus/", ttl=60)
+    with patch("velo_action.cache.time.time", return_value=1000):
+        cache.set("environments", {"DevEnv": "env-1"})
+    with patch("velo_action.cache.time.time", return_value=1061):
+        assert cache.get("environments") is None
+
+
+def test_disk_cache_ignores_corrupt_entries(tmp_path):
+    cache = DiskCache(tmp_path, namespace="https://octopus/", ttl=60)
+    cache.set("environments", {"DevEnv": "env-1"})
+    for path in tmp_path.iterdir():
+        path.write_text("{not json", encoding="utf-8")
+    assert cache.get("environments") is None
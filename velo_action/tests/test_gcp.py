@@ -1,4 +1,6 @@
+# pylint: disable=protected-access
 import os
+from unittest.mock import patch
 
 import pytest
 
@@ -30,3 +32,13 @@ def test_gcp_un_encoded():
 
     service_account_json = service_account_json.replace(os.linesep, "")
     GCP(service_account_json)
+
+
+@patch("velo_action.gcp.storage.Client")
+def test_storage_client_is_cached_per_instance(storage_client):
+    gcp = GCP("project-1")
+    assert gcp._get_storage_client() is gcp._get_storage_client()
+    assert storage_client.call_count == 1
+
+    GCP("project-2")._get_storage_client()
+    assert storage_client.call_count == 2
@@ -6,6 +6,7 @@ import pytest
 from semantic_version import SimpleSpec, Version
 
 from velo_action.utils import (
+    VersionIndex,
     find_matching_version,
     read_field_from_app_spec,
     read_velo_settings,
@@ -48,6 +49,15 @@ def test_should_find_version_that_matches_only_major_highest_minor_low():
     assert find_matching_version(versions, version_to_match) == Version("0.2.10")
 
 
+def test_version_index_matches_many_specs():
+    index = VersionIndex(["0.2.0", "1.0.2", "0.2.10", "1.0.2", "1.7.0"])
+    assert len(index) == 4
+    assert index.highest_match(SimpleSpec("1")) == Version("1.7.0")
+    assert index.highest_match(SimpleSpec("0.2")) == Version("0.2.10")
+    assert index.highest_match(SimpleSpec("<1.0.0")) == Version("0.2.10")
+    assert index.highest_match(SimpleSpec("2")) is None
+
+
 def test_read_app_spec_file_not_found():
     with pytest.raises(FileNotFoundError):
         read_velo_settings(Path("/tmp/not-found"))
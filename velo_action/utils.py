@@ -1,6 +1,7 @@
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, List, Optional, Union
 
 from semantic_version import SimpleSpec, Version
 
@@ -58,13 +59,43 @@ def read_field_from_app_spec(field: str, filename: Path) -> str:
     raise ValueError(f"Could not find '{field}' in {filename}")
 
 
+@lru_cache(maxsize=4096)
+def parse_version(version: str) -> Version:
+    """Coerce a version string into a SemVer, memoized across calls"""
+    return Version.coerce(version)
+
+
+class VersionIndex:
+    """
+    Parsed versions sorted from highest to lowest
+
+    The versions are parsed once, so any number of specs can be matched
+    against the index. Matching stops at the first, and thus highest, version
+    within the spec.
+    """
+
+    def __init__(self, versions: Iterable[str]):
+        self._versions = sorted({parse_version(v) for v in versions}, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def highest_match(self, spec: SimpleSpec) -> Optional[Version]:
+        for version in self._versions:
+            if version in spec:
+                return version
+        return None
+
+
 def find_matching_version(
-    versions: List[str], version_to_match: SimpleSpec
+    versions: Union[List[str], VersionIndex], version_to_match: SimpleSpec
 ) -> Optional[Version]:
     """
     Finds the highest matching version in a list of versions.
     using the python semantic_version package.
+
+    Pass a `VersionIndex` to match several specs against the same versions.
     """
-    versions = [Version.coerce(v) for v in versions]
-    matching_version = version_to_match.select(versions)
-    return matching_version
+    if isinstance(versions, VersionIndex):
+        return versions.highest_match(version_to_match)
+    return version_to_match.select(parse_version(v) for v in versions)